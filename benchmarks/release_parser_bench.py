@@ -0,0 +1,98 @@
+"""
+Benchmark release_parser against the labelled corpus in fixtures/release_names.jsonl.
+
+    python benchmarks/release_parser_bench.py [--repeat N] [--show-misses]
+
+Reports captions/sec and per-field accuracy for parse_release(), next to the
+regex chain extract_movie_info() used before it (title/year/season/episode only).
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from release_parser import parse_release, parse_releases  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "release_names.jsonl")
+FIELDS = ("title", "year", "season", "episode", "quality", "codec", "source", "language")
+
+
+def legacy_parse(caption):
+    """The previous extract_movie_info() logic, kept as the baseline."""
+    season_match = re.search(r'\bS(\d{1,2})\b', caption, re.IGNORECASE)
+    episode_match = re.search(r'\bE(\d{1,2})\b', caption, re.IGNORECASE)
+    season = f"{int(season_match.group(1)):02d}" if season_match else None
+    episode = f"{int(episode_match.group(1)):02d}" if episode_match else None
+    current_year = datetime.now().year + 2
+    years = [
+        y for y in re.findall(r'(\d{4})', caption)
+        if 1900 <= int(y) <= current_year and not re.search(rf'{y}p', caption, re.IGNORECASE)
+    ]
+    release_year = years[-1] if years else None
+    if release_year:
+        movie_name = caption.rsplit(release_year, 1)[0]
+        movie_name = movie_name.replace('.', ' ').replace('(', '').replace(')', '').strip()
+        movie_name = re.split(r'\s*A\s*K\s*A\s*', movie_name, flags=re.IGNORECASE)[0].strip()
+    else:
+        movie_name = caption
+    return {"title": movie_name, "year": release_year, "season": season, "episode": episode}
+
+
+def load_corpus(path=FIXTURES):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def accuracy(parse, corpus, fields, show_misses=False):
+    correct = dict.fromkeys(fields, 0)
+    exact = 0
+    for row in corpus:
+        parsed = parse(row["caption"])
+        row_ok = True
+        for field in fields:
+            if parsed.get(field) == row[field]:
+                correct[field] += 1
+            else:
+                row_ok = False
+                if show_misses:
+                    print(f"  {field:<8} {row['caption']!r}: got {parsed.get(field)!r}, want {row[field]!r}")
+        exact += row_ok
+    return {field: count / len(corpus) for field, count in correct.items()}, exact / len(corpus)
+
+
+def throughput(parse_all, captions, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parse_all(captions)
+    return len(captions) * repeat / (time.perf_counter() - started)
+
+
+def report(name, parse, parse_all, corpus, fields, repeat, show_misses):
+    captions = [row["caption"] for row in corpus]
+    per_field, exact = accuracy(parse, corpus, fields, show_misses)
+    rate = throughput(parse_all, captions, repeat)
+    print(f"{name}: {rate:,.0f} captions/sec, {exact:.0%} fully correct")
+    print("  " + "  ".join(f"{field} {value:.0%}" for field, value in per_field.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the corpus when timing")
+    parser.add_argument("--show-misses", action="store_true", help="print every wrong field")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    print(f"{len(corpus)} labelled captions, {args.repeat} timing passes\n")
+    report("release_parser", parse_release, parse_releases, corpus, FIELDS, args.repeat, args.show_misses)
+    legacy_fields = ("title", "year", "season", "episode")
+    report("legacy", legacy_parse, lambda captions: [legacy_parse(c) for c in captions],
+           corpus, legacy_fields, args.repeat, False)
+
+
+if __name__ == "__main__":
+    main()
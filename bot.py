@@ -12,7 +12,7 @@ from datetime import datetime, timezone
 from collections import defaultdict
 
 from pyrogram import Client, enums, filters
-from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, BotCommand
+from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from pyrogram.errors import ListenerTimeout
 import uvicorn
 
@@ -20,14 +20,21 @@ from config import *
 from utility import (
     add_user, is_token_valid, authorize_user, is_user_authorized,
     generate_token, shorten_url, get_token_link, extract_channel_and_msg_id,
-    safe_api_call, get_allowed_channels, invalidate_search_cache,
+    safe_api_call, channel_registry, invalidate_search_cache,
     delete_after_delay, human_readable_size,
-    queue_file_for_processing, file_queue_worker,
-    file_queue, extract_tmdb_link, periodic_expiry_cleanup,
-    restore_tmdb_photos, restore_imgbb_photos, get_cached_search,
-    set_cached_search
+    queue_file_for_processing, start_file_queue_workers, replay_ingest_queue, ingest_queue,
+    purge_tmdb_resolutions, tmdb_resolve_stats, tmdb_resolve_hit_rate,
+    tmdb_limiter, telegram_post_limiter, mongo_write_limiter, warm_file_name_filter,
+    create_index_job, start_index_job, stop_index_job, resume_index_job,
+    resume_index_jobs, checkpoint_index_jobs, format_index_job, ingest_queue_stats,
+    extract_tmdb_link, periodic_expiry_cleanup,
+    restore_tmdb_photos, restore_imgbb_photos, get_search_result_ids,
+    search_cache, get_channel_file_count, adjust_channel_file_count, get_search_facets,
+    fetch_file_docs, file_doc_cache, backfill_normalized_fields,
+    monitor_loop_lag, loop_lag, load_search_index, search_results_capped, SEARCH_RESULT_LIMIT,
+    flush_file_writes
 )
-from db import (db, users_col, 
+from db import (db_command, ensure_indexes, users_col, files_writer, tmdb_writer, index_jobs_col,
                 tokens_col, 
                 files_col, 
                 allowed_channels_col, 
@@ -37,11 +44,11 @@ from db import (db, users_col,
                 )
 
 from fast_api import api
-from tmdb import get_by_id
+from tmdb import get_by_id, tmdb_client, tmdb_response_cache, imdb_cache_stats
+from search_engine import search_index, tokenize, parse_facet_filters, is_channel_id
 import logging
 from pyrogram.types import CallbackQuery
 from urllib.parse import quote_plus, unquote_plus
-import base64
 
 # =========================
 # Constants & Globals
@@ -65,9 +72,6 @@ bot = Client(
 # Track how many files each user has accessed in the current session
 user_file_count = defaultdict(int)
 
-if "file_name_text" not in [idx["name"] for idx in files_col.list_indexes()]:
-    files_col.create_index([("file_name", "text")])
-
 def encode_file_link(channel_id, message_id):
     # Returns a base64 string for deep linking
     raw = f"{channel_id}_{message_id}".encode()
@@ -91,13 +95,13 @@ async def start_handler(client, message):
         user = message.from_user
         user_name = user.first_name or user.last_name or (user.username and f"@{user.username}") or "USER"
 
-        add_user(user_id)
+        await add_user(user_id)
         bot_username = BOT_USERNAME
 
         # --- Token-based authorization ---
         if len(message.command) == 2 and message.command[1].startswith("token_"):
-            if is_token_valid(message.command[1][6:], user_id):
-                authorize_user(user_id)
+            if await is_token_valid(message.command[1][6:], user_id):
+                await authorize_user(user_id)
                 await safe_api_call(message.reply_text("✅ You are now authorized to access files for 24 hours."))
                 await safe_api_call(bot.send_message(LOG_CHANNEL_ID, f"✅ User <b>{user_name}</b> (<code>{user.id}</code>) authorized via token."))
             else:
@@ -107,13 +111,13 @@ async def start_handler(client, message):
         # --- File access via deep link ---
         if len(message.command) == 2 and message.command[1].startswith("file_"):
             # Check if user is authorized
-            if not is_user_authorized(user_id):
+            if not await is_user_authorized(user_id):
                 now = datetime.now(timezone.utc)
-                token_doc = tokens_col.find_one({
+                token_doc = await tokens_col.find_one({
                     "user_id": user_id,
                     "expiry": {"$gt": now}
                 })
-                token_id = token_doc["token_id"] if token_doc else generate_token(user_id)
+                token_id = token_doc["token_id"] if token_doc else await generate_token(user_id)
                 short_link = shorten_url(get_token_link(token_id, bot_username))
                 reply = await safe_api_call(message.reply_text(
                     "❌ You are not authorized\n"
@@ -143,7 +147,7 @@ async def start_handler(client, message):
                 await safe_api_call(message.reply_text("Invalid file link."))
                 return
 
-            file_doc = files_col.find_one({"channel_id": channel_id, "message_id": msg_id})
+            file_doc = await files_col.find_one({"channel_id": channel_id, "message_id": msg_id})
             if not file_doc:
                 await safe_api_call(message.reply_text("File not found."))
                 return
@@ -176,12 +180,10 @@ async def start_handler(client, message):
 
 @bot.on_message(filters.document | filters.video | filters.audio | filters.photo)
 async def channel_file_handler(client, message):
-    allowed_channels = await get_allowed_channels()
-    if message.chat.id not in allowed_channels:
+    if message.chat.id not in channel_registry:
         return
-    await queue_file_for_processing(message, reply_func=message.reply_text)
-    await file_queue.join()
-    invalidate_search_cache()
+    # Fire-and-forget: the worker pool saves it; search caches are invalidated when the queue drains
+    await queue_file_for_processing(message, reply=("reply", message.chat.id, message.id))
 
 @bot.on_message(filters.command("index") & filters.user(OWNER_ID))
 async def index_channel_files(client, message: Message):
@@ -216,8 +218,7 @@ async def index_channel_files(client, message: Message):
             return
 
         channel_id = start_id
-        allowed_channels = await get_allowed_channels()
-        if channel_id not in allowed_channels:
+        if channel_id not in channel_registry:
             await message.reply_text("❌ This channel is not allowed for indexing.")
             return
 
@@ -229,33 +230,38 @@ async def index_channel_files(client, message: Message):
         return
 
     reply = await message.reply_text(f"Indexing files from {start_msg_id} to {end_msg_id} in channel {channel_id}...")
+    job = await create_index_job(channel_id, start_msg_id, end_msg_id, reply.chat.id, reply.id)
+    start_index_job(client, job)
 
-    batch_size = 50
-    total_queued = 0
-    for batch_start in range(start_msg_id, end_msg_id + 1, batch_size):
-        batch_end = min(batch_start + batch_size - 1, end_msg_id)
-        ids = list(range(batch_start, batch_end + 1))
-        try:
-            messages = []
-            for msg_id in ids:
-                msg = await safe_api_call(client.get_messages(channel_id, msg_id))
-                messages.append(msg)
-        except Exception as e:
-            await message.reply_text(f"Failed to get messages {batch_start}-{batch_end}: {e}")
-            continue
-        for msg in messages:
-            if not msg:
-                continue
-            if msg.document or msg.video or msg.audio or msg.photo:
-                await queue_file_for_processing(
-                    msg,
-                    channel_id=channel_id,
-                    reply_func=reply.edit_text
-                )
-                total_queued += 1
-        invalidate_search_cache()
-
-    logger.info(f"✅ Queued {total_queued} files from channel {channel_id} for processing.")
+@bot.on_message(filters.private & filters.command("jobs") & filters.user(OWNER_ID))
+async def jobs_command(client, message: Message):
+    """
+    /jobs - list recent indexing jobs
+    /jobs pause|resume|cancel <job_id>
+    """
+    args = message.text.split()
+    if len(args) == 1:
+        jobs = await index_jobs_col.find({}).sort("created_at", -1).limit(10).to_list()
+        if not jobs:
+            await safe_api_call(message.reply_text("No indexing jobs."))
+            return
+        await safe_api_call(message.reply_text(
+            "\n\n".join(format_index_job(job) for job in jobs),
+            parse_mode=enums.ParseMode.HTML
+        ))
+        return
+    if len(args) != 3 or args[1] not in ("pause", "resume", "cancel"):
+        await safe_api_call(message.reply_text("Usage: /jobs [pause|resume|cancel <job_id>]"))
+        return
+    action, job_id = args[1], args[2]
+    if action == "resume":
+        job = await resume_index_job(client, job_id)
+    else:
+        job = await stop_index_job(job_id, "paused" if action == "pause" else "cancelled")
+    if not job:
+        await safe_api_call(message.reply_text("Job not found."))
+        return
+    await safe_api_call(message.reply_text(format_index_job(job), parse_mode=enums.ParseMode.HTML))
 
 @bot.on_message(filters.private & filters.command("delete") & filters.user(OWNER_ID))
 async def delete_command(_, message):
@@ -273,13 +279,17 @@ async def delete_command(_, message):
                 await message.reply_text(f"Error: {e}")
                 return
             # Try to find by channel_id and message_id (not msg_id)
-            file_doc = files_col.find_one({"channel_id": channel_id, "message_id": msg_id})
+            file_doc = await files_col.find_one({"channel_id": channel_id, "message_id": msg_id})
             if not file_doc:
                 await message.reply_text("No file found with that link in the database.")
                 return
             # Use the same keys for deletion as for finding
-            result = files_col.delete_one({"channel_id": channel_id, "message_id": msg_id})
+            result = await files_col.delete_one({"channel_id": channel_id, "message_id": msg_id})
+            search_index.remove(channel_id, msg_id)
+            file_doc_cache.delete((channel_id, msg_id))
+            invalidate_search_cache(channel_id)
             if result.deleted_count > 0:
+                adjust_channel_file_count(channel_id, -1)
                 await message.reply_text(f"Database record deleted. File name: {file_doc.get('file_name')}")
             else:
                 await message.reply_text(f"No file found with File name: {file_doc.get('file_name')}")
@@ -289,13 +299,13 @@ async def delete_command(_, message):
             except Exception as e:
                 await message.reply_text(f"Error: {e}")
                 return
-            result = tmdb_col.delete_one({"tmdb_type": tmdb_type, "tmdb_id": tmdb_id})
+            result = await tmdb_col.delete_one({"tmdb_type": tmdb_type, "tmdb_id": tmdb_id})
             if result.deleted_count > 0:
                 await message.reply_text(f"Database record deleted {tmdb_type}/{tmdb_id}.")
             else:
                 await message.reply_text(f"No TMDB record found with ID {tmdb_type}/{tmdb_id} in the database.")
         elif delete_type == "imgbb":
-            result = imgbb_col.delete_one({"pic_url": user_input})
+            result = await imgbb_col.delete_one({"pic_url": user_input})
             if result.deleted_count > 0:
                 await message.reply_text(f"Database record deleted : {user_input}")
             else:
@@ -318,6 +328,10 @@ async def restart(client, message):
             os.remove(log_file)
         except Exception as e:
             await safe_api_call(message.reply_text(f"Failed to delete log file: {e}"))
+    # Checkpoint running index jobs (they resume on startup) and flush pending upserts
+    await checkpoint_index_jobs()
+    await asyncio.gather(flush_file_writes(), tmdb_writer.flush())
+    await tmdb_client.close()
     os.system("python3 update.py")
     os.execl(sys.executable, sys.executable, "bot.py")
 
@@ -367,7 +381,7 @@ async def imgbb_upload_reply_url_handler(client, message):
                 "pic_url": pic.url,
                 "caption": caption,
             }
-            imgbb_col.insert_one(pic_doc)
+            await imgbb_col.insert_one(pic_doc)
             formatted_output = f"🎥 {studio}\n🌟 {star_and_scene}"
             await bot.send_photo(UPDATE_CHANNEL2_ID, f"{pic.url}", caption=f"<b>{formatted_output}</b>")
         except Exception as e:
@@ -388,12 +402,16 @@ async def add_channel_handler(client, message: Message):
         return
     try:
         channel_id = int(message.command[1])
+        if not is_channel_id(channel_id):
+            await message.reply_text("Channel ids look like -100xxxxxxxxxx.")
+            return
         channel_name = " ".join(message.command[2:])
-        allowed_channels_col.update_one(
+        await allowed_channels_col.update_one(
             {"channel_id": channel_id},
             {"$set": {"channel_id": channel_id, "channel_name": channel_name}},
             upsert=True
         )
+        channel_registry.add(channel_id, channel_name)
         await message.reply_text(f"✅ Channel {channel_id} ({channel_name}) added to allowed channels.")
     except Exception as e:
         await message.reply_text(f"Error: {e}")
@@ -409,7 +427,8 @@ async def remove_channel_handler(client, message: Message):
         return
     try:
         channel_id = int(message.command[1])
-        result = allowed_channels_col.delete_one({"channel_id": channel_id})
+        result = await allowed_channels_col.delete_one({"channel_id": channel_id})
+        channel_registry.remove(channel_id)
         if result.deleted_count:
             await message.reply_text(f"✅ Channel {channel_id} removed from allowed channels.")
         else:
@@ -426,11 +445,10 @@ async def broadcast_handler(client, message: Message):
     - Removes users from DB if blocked or deactivated.
     """
     if message.reply_to_message:
-        users = users_col.find({}, {"_id": 0, "user_id": 1})
         total = 0
         failed = 0
         removed = 0
-        for user in users:
+        async for user in users_col.find({}, {"_id": 0, "user_id": 1}):
             try:
                 await safe_api_call(message.reply_to_message.copy(user["user_id"]))
                 total += 1
@@ -438,7 +456,7 @@ async def broadcast_handler(client, message: Message):
                 failed += 1
                 err_str = str(e)
                 if "UserIsBlocked" in err_str or "InputUserDeactivated" in err_str:
-                    users_col.delete_one({"user_id": user["user_id"]})
+                    await users_col.delete_one({"user_id": user["user_id"]})
                     removed += 1
                 continue
             await asyncio.sleep(3)
@@ -463,29 +481,88 @@ async def send_log_file(client, message: Message):
 async def stats_command(client, message: Message):
     """Show statistics (only for OWNER_ID)."""
     try:
-        total_auth_users = auth_users_col.count_documents({})
-        total_users = users_col.count_documents({})
-        total_files = files_col.count_documents({})
+        total_auth_users, total_users, total_files = await asyncio.gather(
+            auth_users_col.count_documents({}),
+            users_col.count_documents({}),
+            files_col.count_documents({})
+        )
         pipeline = [
             {"$group": {"_id": None, "total": {"$sum": "$file_size"}}}
         ]
-        result = list(files_col.aggregate(pipeline))
+        result = await files_col.aggregate(pipeline)
         total_storage = result[0]["total"] if result else 0
 
-        stats = db.command("dbstats")
+        stats = await db_command("dbstats")
         db_storage = stats.get("storageSize", 0)
+        cache_stats = search_cache.stats()
+        queue_stats = ingest_queue_stats()
+        durable_counts = await ingest_queue.counts()
+        tmdb_cache_stats = tmdb_response_cache.stats()
+        tmdb_cache_bytes = await tmdb_response_cache.total_bytes()
+        imdb_stats = imdb_cache_stats()
 
         await safe_api_call(
             message.reply_text(
             f"👤 Total auth users: <b>{total_auth_users}/{total_users}</b>\n"
             f"📁 Total files: <b>{total_files}</b>\n"
             f"💾 Files size: <b>{human_readable_size(total_storage)}</b>\n"
-            f"📊 Database storage used: <b>{db_storage / (1024 * 1024):.2f} MB</b>",
+            f"📊 Database storage used: <b>{db_storage / (1024 * 1024):.2f} MB</b>\n"
+            f"🔎 Search index: " + (
+                f"<b>{len(search_index)}</b> files" if search_index.ready
+                else f"<b>failed</b> ({search_index.last_error}), retrying" if search_index.last_error
+                else "<b>building</b>"
+            ) + "\n"
+            f"🗂 Search cache: <b>{cache_stats['entries']}</b> entries, "
+            f"<b>{cache_stats['hit_rate']:.0%}</b> hits "
+            f"({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}), "
+            f"<b>{cache_stats['evictions']}</b> evictions\n"
+            f"📥 Ingest queue: <b>{queue_stats['queued']}</b> queued, "
+            f"<b>{queue_stats['active']}</b> in progress, "
+            f"<b>{durable_counts.get('failed', 0)}</b> failed\n"
+            f"🎬 TMDB resolutions: <b>{tmdb_resolve_hit_rate():.0%}</b> cached "
+            f"({tmdb_resolve_stats['memory_hits']} memory, {tmdb_resolve_stats['db_hits']} db, "
+            f"{tmdb_resolve_stats['negative_hits']} misses, {tmdb_resolve_stats['lookups']} lookups)\n"
+            f"🌐 TMDB API: " + (", ".join(
+                f"{endpoint} <b>{metric['requests']}</b> "
+                f"({metric['avg_ms']:.0f}/{metric['p95_ms']:.0f} ms avg/p95, "
+                f"{metric['retries']} retries, {metric['errors']} errors)"
+                for endpoint, metric in tmdb_client.stats().items()
+            ) or "no requests") + "\n"
+            f"🗃 TMDB response cache: <b>{tmdb_cache_stats['hit_rate']:.0%}</b> hits "
+            f"({tmdb_cache_stats['hits']} fresh, {tmdb_cache_stats['revalidated']} revalidated, "
+            f"{tmdb_cache_stats['misses']} misses), "
+            f"<b>{human_readable_size(tmdb_cache_stats['bytes_saved'])}</b> saved, "
+            f"{human_readable_size(tmdb_cache_bytes)} stored\n"
+            f"⭐️ IMDb: <b>{imdb_stats['hit_rate']:.0%}</b> cached "
+            f"({imdb_stats['memory_hits']} memory, {imdb_stats['db_hits']} db, {imdb_stats['lookups']} lookups, "
+            f"{imdb_stats['timeouts']} timeouts, {imdb_stats['errors']} errors), "
+            f"circuit <b>{imdb_stats['breaker']}</b> ({imdb_stats['skipped']} skipped)\n"
+            f"🚦 Rate-limit waits: " + ", ".join(
+                f"{limiter.name} <b>{limiter.waits}</b> ({limiter.waited_seconds:.0f}s)"
+                for limiter in (tmdb_limiter, telegram_post_limiter, mongo_write_limiter)
+            ) + "\n"
+            f"📦 Bulk writes: files <b>{files_writer.batches}</b> batches / <b>{files_writer.ops}</b> ops "
+            f"(<b>{files_writer.stats()['avg_ms']:.0f} ms</b> avg, {files_writer.errors} failed), "
+            f"tmdb <b>{tmdb_writer.batches}</b> / <b>{tmdb_writer.ops}</b>\n"
+            f"⏱ Loop lag: <b>{loop_lag['avg_ms']:.1f} ms</b> avg, <b>{loop_lag['max_ms']:.1f} ms</b> max",
             )
         )
     except Exception as e:
         await message.reply_text(f"⚠️ An error occurred while fetching stats:\n<code>{e}</code>")
 
+@bot.on_message(filters.private & filters.command("purgetmdb") & filters.user(OWNER_ID))
+async def purge_tmdb_command(client, message: Message):
+    """
+    /purgetmdb all|misses|<title>
+    Drop cached title -> TMDB resolutions so they are looked up again.
+    """
+    args = message.text.split(maxsplit=1)
+    if len(args) < 2:
+        await safe_api_call(message.reply_text("Usage: /purgetmdb all|misses|<title>"))
+        return
+    deleted = await purge_tmdb_resolutions(args[1].strip())
+    await safe_api_call(message.reply_text(f"🧹 Purged {deleted} cached TMDB resolution(s)."))
+
 @bot.on_message(filters.private & filters.command("tmdb") & filters.user(OWNER_ID))
 async def tmdb_command(client, message):
     try:
@@ -512,7 +589,7 @@ async def tmdb_command(client, message):
         }
         if season_info:
             update["$addToSet"] = {"season_info": season_info}
-        tmdb_col.update_one(
+        await tmdb_col.update_one(
             {"tmdb_id": tmdb_id, "tmdb_type": tmdb_type},
             update,
             upsert=True
@@ -542,7 +619,7 @@ async def search_files_handler(client, message):
     If no query is given, lets user browse by channel or select a channel to search in.
     """
     args = message.text.split(maxsplit=1)
-    channels = list(allowed_channels_col.find({}, {"_id": 0, "channel_id": 1, "channel_name": 1}))
+    channels = channel_registry.items()
     if len(args) < 2:
         # No query: show channel browse menu and search-in-channel menu
         if not channels:
@@ -589,31 +666,52 @@ async def search_files_handler(client, message):
         bot.loop.create_task(delete_after_delay(client, reply.chat.id, reply.id))
     bot.loop.create_task(delete_after_delay(client, message.chat.id, message.id))
 
+@bot.on_message(filters.command("suggest") & filters.chat(GROUP_ID))
+async def suggest_handler(client, message):
+    """
+    Type-ahead for the group: /suggest <start of a title>
+    Replies with the most popular matching titles as buttons that run the search.
+    """
+    args = message.text.split(maxsplit=1)
+    suggestions = search_index.suggestions.suggest(args[1]) if len(args) > 1 else []
+    buttons = []
+    for title in suggestions:
+        callback_data = f"search_{quote_plus(title)}_0"
+        if len(callback_data.encode()) <= 64:  # Telegram callback_data limit
+            buttons.append([InlineKeyboardButton(title, callback_data=callback_data)])
+    if buttons:
+        reply = await safe_api_call(message.reply_text("💡 Did you mean:", reply_markup=InlineKeyboardMarkup(buttons)))
+    else:
+        reply = await safe_api_call(message.reply_text("No suggestions. Usage: /suggest <title start>"))
+    if reply:
+        bot.loop.create_task(delete_after_delay(client, reply.chat.id, reply.id))
+    bot.loop.create_task(delete_after_delay(client, message.chat.id, message.id))
+
+def facet_summary(facets, top=3):
+    """One-line digest of the most common facet values, e.g. 'format: mkv 12, mp4 3 · year: ...'."""
+    parts = []
+    for facet, counts in facets.items():
+        if not counts:
+            continue
+        best = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:top]
+        parts.append(f"{facet}: " + ", ".join(f"{value} {count}" for value, count in best))
+    return " · ".join(parts)
+
 async def send_search_results(client, message_or_callback, query, page, as_callback=False, channel_id=None):
-    # Try cache first
     skip = page * SEARCH_PAGE_SIZE
-    files, total_files = get_cached_search(query, page, channel_id)
-    if files is None:
-        search_filter = {}
-        if channel_id is not None:
-            search_filter["channel_id"] = channel_id
-        channels = list(allowed_channels_col.find({}, {"_id": 0, "channel_id": 1}))
-        allowed_ids = [c["channel_id"] for c in channels]
-        if channel_id is None:
-            search_filter["channel_id"] = {"$in": allowed_ids}
-        if files_col.index_information().get("file_name_text"):
-            search_filter["$text"] = {"$search": query}
-            projection = {"_id": 0, "file_name": 1, "file_size": 1, "file_format": 1, "message_id": 1, "date": 1, "channel_id": 1, "score": {"$meta": "textScore"}}
-            cursor = files_col.find(search_filter, projection).sort([("score", {"$meta": "textScore"})]).skip(skip).limit(SEARCH_PAGE_SIZE)
-            files = list(cursor)
-            total_files = files_col.count_documents(search_filter)
-        else:
-            regex = ".*".join(map(lambda s: re.escape(s), query.strip().split()))
-            search_filter["file_name"] = {"$regex": regex, "$options": "i"}
-            projection = {"_id": 0, "file_name": 1, "file_size": 1, "file_format": 1, "message_id": 1, "date": 1, "channel_id": 1}
-            files = list(files_col.find(search_filter, projection).sort("message_id", -1).skip(skip).limit(SEARCH_PAGE_SIZE))
-            total_files = files_col.count_documents(search_filter)
-        set_cached_search(query, page, channel_id, files, total_files)
+    result_ids = await get_search_result_ids(query, channel_id)
+    corrected_from = None
+    if not result_ids and search_index.ready:
+        # Typo tolerance: retry once with the closest known title tokens
+        corrected = search_index.correct(query)
+        if corrected:
+            corrected_ids = await get_search_result_ids(corrected, channel_id)
+            if corrected_ids:
+                corrected_from, query, result_ids = query, corrected, corrected_ids
+    total_files = len(result_ids)
+    if result_ids and page == 0:
+        search_index.suggestions.record_hit(" ".join(tokenize(parse_facet_filters(query)[0])))
+    files = await fetch_file_docs(result_ids[skip:skip + SEARCH_PAGE_SIZE])
     if not files:
         text = "No files found for your search."
         if as_callback:
@@ -626,13 +724,18 @@ async def send_search_results(client, message_or_callback, query, page, as_callb
                 bot.loop.create_task(delete_after_delay(client, reply.chat.id, reply.id))
         return
 
-    # Map channel_id to channel_name for display
-    channel_map = {c["channel_id"]: c["channel_name"] for c in allowed_channels_col.find({}, {"_id": 0, "channel_id": 1, "channel_name": 1})}
-
     text = f"Search results for <b>{query}</b> (Page {page+1}):"
+    if search_results_capped(result_ids):
+        text += f"\n<i>{SEARCH_RESULT_LIMIT}+ matches; only the first {SEARCH_RESULT_LIMIT} are listed while the search index loads.</i>"
+    if corrected_from:
+        text = f"No results for <i>{corrected_from}</i>. Did you mean <b>{query}</b>?\n" + text
+    if page == 0 and total_files > SEARCH_PAGE_SIZE:
+        summary = facet_summary(await get_search_facets(query, channel_id))
+        if summary:
+            text += f"\n<i>{summary}</i>\nNarrow with e.g. <code>{query} year:2020 format:mkv size:1-2gb</code>"
     buttons = []
     for f in files:
-        channel_name = channel_map.get(f["channel_id"], str(f["channel_id"]))
+        channel_name = channel_registry.name(f["channel_id"], str(f["channel_id"]))
         file_link = encode_file_link(f["channel_id"], f["message_id"])
         size_str = human_readable_size(f.get('file_size', 0))
         score_str = ""
@@ -701,24 +804,35 @@ async def search_channel_callback(client, callback_query: CallbackQuery):
     query = unquote_plus(query)
     await send_search_results(client, callback_query, query, page, as_callback=True, channel_id=channel_id)
 
-@bot.on_callback_query(filters.regex(r"^browse_(\-?\d+)_(\d+)$"))
+@bot.on_callback_query(filters.regex(r"^browse_(\-?\d+)_(\d+)(?:_([np])(\d+))?$"))
 async def browse_channel_callback(client, callback_query: CallbackQuery):
-    m = re.match(r"^browse_(\-?\d+)_(\d+)$", callback_query.data)
+    """
+    Browse a channel newest-first with keyset pagination.
+    Callback data is browse_<channel_id>_<page>[_<n|p><anchor_message_id>]:
+    'n' pages older than the anchor, 'p' pages newer than it.
+    """
+    m = re.match(r"^browse_(\-?\d+)_(\d+)(?:_([np])(\d+))?$", callback_query.data)
     if not m:
         reply = await safe_api_call(callback_query.answer("Invalid browse callback.", show_alert=True))
         return
-    channel_id, page = m.groups()
+    channel_id, page, direction, anchor = m.groups()
     channel_id = int(channel_id)
     page = int(page)
-    skip = page * SEARCH_PAGE_SIZE
-    files = list(files_col.find(
-        {"channel_id": channel_id},
-        {"_id": 0, "file_name": 1, "file_size": 1, "file_format": 1, "message_id": 1, "date": 1, "channel_id": 1}
-    ).sort("message_id", -1).skip(skip).limit(SEARCH_PAGE_SIZE))
-    total_files = files_col.count_documents({"channel_id": channel_id})
+    projection = {"_id": 0, "file_name": 1, "file_size": 1, "file_format": 1, "message_id": 1, "date": 1, "channel_id": 1}
+    if direction == "p":
+        files = await files_col.find(
+            {"channel_id": channel_id, "message_id": {"$gt": int(anchor)}},
+            projection
+        ).sort("message_id", 1).limit(SEARCH_PAGE_SIZE).to_list()
+        files.reverse()
+    else:
+        browse_filter = {"channel_id": channel_id}
+        if direction == "n":
+            browse_filter["message_id"] = {"$lt": int(anchor)}
+        files = await files_col.find(browse_filter, projection).sort("message_id", -1).limit(SEARCH_PAGE_SIZE).to_list()
+    total_files = await get_channel_file_count(channel_id)
 
-    channel_doc = allowed_channels_col.find_one({"channel_id": channel_id})
-    channel_name = channel_doc["channel_name"] if channel_doc else str(channel_id)
+    channel_name = channel_registry.name(channel_id, str(channel_id))
 
     if not files:
         reply = await safe_api_call(callback_query.edit_message_text(f"No files found in <b>{channel_name}</b>.", parse_mode=enums.ParseMode.HTML))
@@ -737,10 +851,10 @@ async def browse_channel_callback(client, callback_query: CallbackQuery):
         ])
 
     nav = []
-    if skip > 0:
-        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"browse_{channel_id}_{page-1}"))
-    if skip + SEARCH_PAGE_SIZE < total_files:
-        nav.append(InlineKeyboardButton("Next ➡️", callback_data=f"browse_{channel_id}_{page+1}"))
+    if page > 0:
+        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"browse_{channel_id}_{page-1}_p{files[0]['message_id']}"))
+    if (page + 1) * SEARCH_PAGE_SIZE < total_files:
+        nav.append(InlineKeyboardButton("Next ➡️", callback_data=f"browse_{channel_id}_{page+1}_n{files[-1]['message_id']}"))
     if nav:
         buttons.append(nav)
 
@@ -813,6 +927,10 @@ async def main():
     # Set bot commands
 
 
+    await ensure_indexes()
+    await channel_registry.load()
+    await tmdb_client.start()
+    await replay_ingest_queue()  # Re-queue files left unfinished by the last run, before new uploads arrive
     await bot.start()
 
     #await bot.set_bot_commands([
@@ -820,8 +938,13 @@ async def main():
     #])
     
     bot.loop.create_task(start_fastapi())
-    bot.loop.create_task(file_queue_worker(bot))  # Start the queue worker
+    start_file_queue_workers(bot)  # Start the ingestion worker pool
+    bot.loop.create_task(load_search_index())  # Build the in-memory search index (retried until it succeeds)
+    bot.loop.create_task(warm_file_name_filter())  # Warm the duplicate-check filter
+    bot.loop.create_task(resume_index_jobs(bot))  # Pick up /index runs interrupted by a restart
+    bot.loop.create_task(backfill_normalized_fields())  # Migrate files indexed before title_norm existed
     bot.loop.create_task(periodic_expiry_cleanup())
+    bot.loop.create_task(monitor_loop_lag())
 
     # Send startup message to log channel
     try:
@@ -854,6 +977,7 @@ if __name__ == "__main__":
         bot.loop.run_until_complete(main())
         bot.loop.run_forever()
     except KeyboardInterrupt:
+        bot.loop.run_until_complete(tmdb_client.close())
         bot.stop()
         tasks = asyncio.all_tasks(loop=bot.loop)
         for task in tasks:
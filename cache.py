@@ -0,0 +1,189 @@
+import sys
+import math
+import time
+import hashlib
+import asyncio
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def approx_size(obj):
+    """Rough deep size in bytes of plain containers (dict/list/tuple/set) and scalars."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item) for item in obj)
+    return size
+
+
+class LRUCache:
+    """
+    Size- and memory-bounded LRU cache with a per-entry TTL.
+    - Least recently used entries are evicted once max_entries or max_bytes is exceeded.
+    - get_or_load() coalesces concurrent misses for a key onto a single loader call.
+    - hits, misses, evictions and expirations are counted for /stats.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=None, ttl=None, sizer=approx_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizer = sizer
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self._data = OrderedDict()  # key -> (value, expires_at, size)
+        self._inflight = {}
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def _pop(self, key):
+        value, _, size = self._data.pop(key)
+        self.bytes -= size
+        return value
+
+    def get(self, key, default=None, count=True):
+        entry = self._data.get(key)
+        if entry is None:
+            if count:
+                self.misses += 1
+            return default
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._pop(key)
+            self.expirations += 1
+            if count:
+                self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        if count:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        if key in self._data:
+            self._pop(key)
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        size = self.sizer(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+        self._data[key] = (value, expires_at, size)
+        self.bytes += size
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes and self.bytes > self.max_bytes)
+        ):
+            self._pop(next(iter(self._data)))
+            self.evictions += 1
+
+    def delete(self, key):
+        if key in self._data:
+            self._pop(key)
+            return True
+        return False
+
+    def invalidate(self, predicate=None):
+        """Drop every entry whose key matches predicate (all entries if None). Returns the count."""
+        self._generation += 1
+        if predicate is None:
+            removed = len(self._data)
+            self._data.clear()
+            self.bytes = 0
+            return removed
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            self._pop(key)
+        return len(keys)
+
+    def clear(self):
+        self.invalidate()
+
+    async def get_or_load(self, key, loader, ttl=None):
+        """
+        Return the cached value for key, or await loader() to produce it.
+        Concurrent callers missing on the same key share one loader call,
+        run as a task none of them owns: a cancelled caller stops waiting
+        but the load carries on for the rest.
+        A value loaded across an invalidate() is returned but not cached.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._load(key, loader, ttl))
+            # Mark a failure retrieved in case every caller was cancelled
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader, ttl):
+        generation = self._generation
+        try:
+            value = await loader()
+        finally:
+            self._inflight.pop(key, None)
+        if generation == self._generation:
+            self.set(key, value, ttl)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "coalesced": self.coalesced,
+        }
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+    - `key in bloom` is False only if key was never added; True may be a false positive.
+    - Sized for `capacity` keys at `error_rate`; past that the false-positive rate climbs.
+    - Keys can't be removed, so deletions simply stay as (harmless) false positives.
+    """
+
+    def __init__(self, capacity=100_000, error_rate=0.01):
+        capacity = max(1, int(capacity))
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def __len__(self):
+        return self.count
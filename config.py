@@ -56,8 +56,47 @@ MY_DOMAIN = os.getenv('MY_DOMAIN')
 TOKEN_VALIDITY_SECONDS = 24 * 60 * 60  # 24 hours
 
 MONGO_URI = os.getenv("MONGO_URI")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 32))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 4))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000))
+# Write-behind batching: flush after this many ops or this many seconds
+BULK_WRITE_MAX_BATCH = int(os.getenv("BULK_WRITE_MAX_BATCH", 500))
+BULK_WRITE_MAX_DELAY = float(os.getenv("BULK_WRITE_MAX_DELAY", 0.25))
 
 TMDB_API_KEY = os.getenv('TMDB_API_KEY')
+# TMDB HTTP client: pooled connections, request timeout (seconds) and retries per request
+TMDB_CONNECTION_LIMIT = int(os.getenv("TMDB_CONNECTION_LIMIT", 10))
+TMDB_TIMEOUT = float(os.getenv("TMDB_TIMEOUT", 15))
+TMDB_RETRIES = int(os.getenv("TMDB_RETRIES", 3))
+# TMDB response cache (Mongo): total body size kept under this many bytes
+TMDB_CACHE_MAX_BYTES = int(os.getenv("TMDB_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Title -> TMDB id resolution cache: matches and "no match" results expire after these many seconds
+TMDB_RESOLVE_TTL = int(os.getenv("TMDB_RESOLVE_TTL", 30 * 24 * 60 * 60))
+TMDB_RESOLVE_MISS_TTL = int(os.getenv("TMDB_RESOLVE_MISS_TTL", 24 * 60 * 60))
+# IMDb rating/plot lookups: scraper threads, per-lookup timeout (seconds), failures
+# before lookups are skipped and for how long (seconds), and how long "not found" is cached
+IMDB_WORKERS = int(os.getenv("IMDB_WORKERS", 2))
+IMDB_TIMEOUT = float(os.getenv("IMDB_TIMEOUT", 10))
+IMDB_BREAKER_THRESHOLD = int(os.getenv("IMDB_BREAKER_THRESHOLD", 5))
+IMDB_BREAKER_COOLDOWN = int(os.getenv("IMDB_BREAKER_COOLDOWN", 5 * 60))
+IMDB_MISS_TTL = int(os.getenv("IMDB_MISS_TTL", 7 * 24 * 60 * 60))
+
+#INGESTION
+# Worker count and per-resource rate limits (requests per second) for the file queue
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 4))
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", 20))
+TELEGRAM_POST_RATE_LIMIT = float(os.getenv("TELEGRAM_POST_RATE_LIMIT", 0.33))
+MONGO_WRITE_RATE_LIMIT = float(os.getenv("MONGO_WRITE_RATE_LIMIT", 200))
+# Durable ingest queue (SQLite); items failing this many times are parked as failed
+INGEST_QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "ingest_queue.db")
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", 5))
+# Seconds before the first retry of a failed file; doubled on each further attempt
+INGEST_RETRY_DELAY = float(os.getenv("INGEST_RETRY_DELAY", 30))
+# /index: message ids per get_messages call (Telegram caps this at 200) and batches fetched ahead
+INDEX_BATCH_SIZE = min(200, int(os.getenv("INDEX_BATCH_SIZE", 200)))
+INDEX_PREFETCH = int(os.getenv("INDEX_PREFETCH", 2))
+
+#IMGBB API
 IMGBB_API_KEY = os.getenv('IMGBB_API_KEY')
 
 #SHORTERNER API
@@ -0,0 +1,150 @@
+import io
+import struct
+from mutagen.id3 import ID3
+from mutagen.flac import Picture
+
+# =========================
+# Embedded Cover Art
+# =========================
+# Cover art lives in the tag header: the ID3v2 tag at the start of an MP3,
+# the FLAC metadata blocks, or the moov atom of an MP4/M4A. These helpers
+# find it in a partial download. find_cover() either returns the image or
+# says which byte range of the file it needs next, so the caller only ever
+# streams the header, never the audio.
+
+COVER_FRONT = 3  # APIC / FLAC picture type for the front cover
+
+
+def detect_format(head):
+    """Container of an audio file from its first 12 bytes: 'id3', 'flac', 'mp4' or None."""
+    if head[:3] == b"ID3":
+        return "id3"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    return None
+
+
+def image_extension(data):
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return "jpg"
+
+
+def _span(data, offset, start, end):
+    """File bytes [start, end) if the buffer (holding the file from `offset`) covers them."""
+    if start < offset or end > offset + len(data):
+        return None
+    return bytes(data[start - offset:end - offset])
+
+
+def _id3_cover(data, offset):
+    header = _span(data, offset, 0, 10)
+    size = 0
+    for byte in header[6:10]:
+        size = (size << 7) | (byte & 0x7F)  # syncsafe
+    end = 10 + size + (10 if header[5] & 0x10 else 0)  # + footer
+    tag = _span(data, offset, 0, end)
+    if tag is None:
+        return None, (0, end)
+    pictures = ID3(io.BytesIO(tag)).getall("APIC")
+    if not pictures:
+        return None, None
+    best = next((picture for picture in pictures if picture.type == COVER_FRONT), pictures[0])
+    return best.data, None
+
+
+def _flac_cover(data, offset):
+    pos = 4
+    fallback = None
+    while True:
+        header = _span(data, offset, pos, pos + 4)
+        if header is None:
+            return None, (0, pos + 4)
+        is_last, block_type = header[0] & 0x80, header[0] & 0x7F
+        length = int.from_bytes(header[1:4], "big")
+        if block_type == 6:
+            block = _span(data, offset, pos + 4, pos + 4 + length)
+            if block is None:
+                return None, (0, pos + 4 + length)
+            picture = Picture(block)
+            if picture.type == COVER_FRONT:
+                return picture.data, None
+            fallback = fallback or picture.data
+        if is_last:
+            return fallback, None
+        pos += 4 + length
+
+
+def _mp4_atoms(body, start, end):
+    """Yield (name, body_start, body_end) for the atoms in body[start:end]."""
+    while start + 8 <= end:
+        size, name = struct.unpack(">I4s", body[start:start + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", body[start + 8:start + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - start
+        if size < header or start + size > end:
+            return
+        yield name, start + header, start + size
+        start += size
+
+
+def _mp4_child(body, start, end, name, skip=0):
+    for child, child_start, child_end in _mp4_atoms(body, start, end):
+        if child == name:
+            return child_start + skip, child_end
+    return None
+
+
+def _mp4_cover(data, offset, pos):
+    # Walk top-level atoms from pos; mdat may come before moov, in which case
+    # the caller jumps straight past it
+    while True:
+        header = _span(data, offset, pos, pos + 16)
+        if header is None:
+            header = _span(data, offset, pos, pos + 8)
+            if header is None or struct.unpack(">I", header[:4])[0] == 1:
+                return None, (pos, pos + 16)
+        size, name = struct.unpack(">I4s", header[:8])
+        if size == 1:
+            size = struct.unpack(">Q", header[8:16])[0]
+        elif size == 0:
+            if name != b"moov":
+                return None, None  # Last atom runs to EOF and it isn't moov
+        if size and size < 8:
+            return None, None
+        if name != b"moov":
+            pos += size
+            continue
+        moov = _span(data, offset, pos, pos + size)
+        if moov is None:
+            return None, (pos, pos + size)
+        found = (0, len(moov))
+        path = ((b"moov", 0), (b"udta", 0), (b"meta", 4), (b"ilst", 0), (b"covr", 0), (b"data", 8))
+        for atom, skip in path:
+            found = _mp4_child(moov, found[0], found[1], atom, skip)
+            if found is None:
+                return None, None
+        return moov[found[0]:found[1]] or None, None
+
+
+def find_cover(fmt, data, offset=0, pos=0):
+    """
+    Look for the cover image in `data`, which holds the file's bytes from `offset`.
+    Returns (image_bytes, None) when found, (None, None) when the file has no
+    cover, or (None, (start, end)) when bytes [start, end) are needed first;
+    call again with pos=start once they are buffered.
+    """
+    if fmt == "id3":
+        return _id3_cover(data, offset)
+    if fmt == "flac":
+        return _flac_cover(data, offset)
+    if fmt == "mp4":
+        return _mp4_cover(data, offset, pos)
+    return None, None
@@ -1,16 +1,308 @@
+import time
+import asyncio
+import functools
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 from pymongo import MongoClient
-from config import MONGO_URI
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from config import (
+    MONGO_URI, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, BULK_WRITE_MAX_BATCH,
+    BULK_WRITE_MAX_DELAY, logger
+)
 
 
 # MongoDB setup
-mongo = MongoClient(MONGO_URI)
+mongo = MongoClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=5 * 60 * 1000,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    retryWrites=True,
+)
 db = mongo["sharing_bot"]
-files_col = db["files"]
-tmdb_col = db["tmdb"]
-imgbb_col = db["imgbb"]
-tokens_col = db["tokens"]
-auth_users_col = db["auth_users"]
-allowed_channels_col = db["allowed_channels"]
-users_col = db["users"]
 
+# =========================
+# Async Access Layer
+# =========================
+# pymongo calls run on a dedicated thread pool sized to the connection pool,
+# so a slow query only parks a worker thread, never the asyncio loop shared
+# by pyrogram and uvicorn.
 
+mongo_executor = ThreadPoolExecutor(max_workers=MONGO_MAX_POOL_SIZE, thread_name_prefix="mongo")
+
+async def run_sync(func, *args, **kwargs):
+    """Run a blocking pymongo call on the Mongo thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(mongo_executor, functools.partial(func, *args, **kwargs))
+
+
+class AsyncCursor:
+    """
+    Lazily-built find() cursor. sort/skip/limit/batch_size chain like pymongo;
+    the query only runs on to_list() or async iteration.
+    """
+
+    def __init__(self, collection, args, kwargs):
+        self._collection = collection
+        self._args = args
+        self._kwargs = kwargs
+        self._chain = []
+
+    def _chained(self, name, *args, **kwargs):
+        self._chain.append((name, args, kwargs))
+        return self
+
+    def sort(self, *args, **kwargs):
+        return self._chained("sort", *args, **kwargs)
+
+    def skip(self, *args, **kwargs):
+        return self._chained("skip", *args, **kwargs)
+
+    def limit(self, *args, **kwargs):
+        return self._chained("limit", *args, **kwargs)
+
+    def batch_size(self, *args, **kwargs):
+        return self._chained("batch_size", *args, **kwargs)
+
+    def build(self):
+        """Return the underlying synchronous pymongo cursor."""
+        cursor = self._collection.find(*self._args, **self._kwargs)
+        for name, args, kwargs in self._chain:
+            cursor = getattr(cursor, name)(*args, **kwargs)
+        return cursor
+
+    async def to_list(self, length=None):
+        def fetch():
+            cursor = self.build()
+            return list(cursor if length is None else islice(cursor, length))
+        return await run_sync(fetch)
+
+    async def __aiter__(self):
+        cursor = self.build()
+        try:
+            while True:
+                batch = await run_sync(lambda: list(islice(cursor, 500)))
+                if not batch:
+                    break
+                for doc in batch:
+                    yield doc
+        finally:
+            cursor.close()
+
+
+class AsyncCollection:
+    """Awaitable wrapper around a pymongo Collection; the raw collection stays available as .sync."""
+
+    def __init__(self, collection):
+        self.sync = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.sync, args, kwargs)
+
+    async def find_one(self, *args, **kwargs):
+        return await run_sync(self.sync.find_one, *args, **kwargs)
+
+    async def insert_one(self, *args, **kwargs):
+        return await run_sync(self.sync.insert_one, *args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return await run_sync(self.sync.update_one, *args, **kwargs)
+
+    async def update_many(self, *args, **kwargs):
+        return await run_sync(self.sync.update_many, *args, **kwargs)
+
+    async def delete_one(self, *args, **kwargs):
+        return await run_sync(self.sync.delete_one, *args, **kwargs)
+
+    async def delete_many(self, *args, **kwargs):
+        return await run_sync(self.sync.delete_many, *args, **kwargs)
+
+    async def bulk_write(self, *args, **kwargs):
+        return await run_sync(self.sync.bulk_write, *args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs):
+        return await run_sync(self.sync.count_documents, *args, **kwargs)
+
+    async def aggregate(self, *args, **kwargs):
+        return await run_sync(lambda: list(self.sync.aggregate(*args, **kwargs)))
+
+    async def create_index(self, *args, **kwargs):
+        return await run_sync(self.sync.create_index, *args, **kwargs)
+
+    async def index_information(self):
+        return await run_sync(self.sync.index_information)
+
+
+class BulkOpResult:
+    """Outcome of one operation inside a bulk_write batch."""
+
+    __slots__ = ("upserted_id",)
+
+    def __init__(self, upserted_id=None):
+        self.upserted_id = upserted_id
+
+
+class BulkWriter:
+    """
+    Write-behind batcher for one collection.
+    - enqueue(op) queues a pymongo write op (UpdateOne, InsertOne...) and
+      returns a future for it straight away, so a caller can keep producing
+      ops and check the outcome later; submit(op) awaits that future.
+    - A batch is flushed by bulk_write(ordered=False) when it reaches
+      max_batch ops or max_delay seconds after its first op.
+    - Per-op failures (BulkWriteError.writeErrors) are raised to that op's
+      submitter only; a whole-batch failure is raised to every submitter.
+    """
+
+    def __init__(self, collection, max_batch=BULK_WRITE_MAX_BATCH, max_delay=BULK_WRITE_MAX_DELAY):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.ops = 0
+        self.errors = 0
+        self.last_ms = 0.0
+        self.total_ms = 0.0
+        self._pending = []  # (op, future)
+        self._timer = None
+        self._flushing = set()
+
+    def enqueue(self, op):
+        """Queue op without waiting; the future resolves to a BulkOpResult or raises once written."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((op, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush)
+        return future
+
+    async def submit(self, op):
+        return await self.enqueue(op)
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._write(batch))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def flush(self):
+        """Write everything queued so far and wait for in-flight batches."""
+        self._start_flush()
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    async def _write(self, batch):
+        started = time.perf_counter()
+        results = [None] * len(batch)
+        try:
+            result = await self.collection.bulk_write([op for op, _ in batch], ordered=False)
+            upserted_ids = result.upserted_ids or {}
+        except BulkWriteError as e:
+            upserted_ids = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+            for error in e.details.get("writeErrors", []):
+                results[error["index"]] = BulkWriteError({"writeErrors": [error]})
+        except Exception as e:
+            upserted_ids = {}
+            results = [e] * len(batch)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.batches += 1
+        self.ops += len(batch)
+        self.last_ms = elapsed_ms
+        self.total_ms += elapsed_ms
+        failed = sum(1 for outcome in results if outcome is not None)
+        self.errors += failed
+        logger.debug(
+            f"bulk_write {self.collection.name}: {len(batch)} ops, "
+            f"{failed} failed, {elapsed_ms:.1f} ms"
+        )
+
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if results[index] is not None:
+                future.set_exception(results[index])
+            else:
+                future.set_result(BulkOpResult(upserted_ids.get(index)))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "ops": self.ops,
+            "errors": self.errors,
+            "pending": len(self._pending),
+            "last_ms": self.last_ms,
+            "avg_ms": self.total_ms / self.batches if self.batches else 0.0,
+        }
+
+
+files_col = AsyncCollection(db["files"])
+tmdb_col = AsyncCollection(db["tmdb"])
+imgbb_col = AsyncCollection(db["imgbb"])
+tokens_col = AsyncCollection(db["tokens"])
+auth_users_col = AsyncCollection(db["auth_users"])
+allowed_channels_col = AsyncCollection(db["allowed_channels"])
+users_col = AsyncCollection(db["users"])
+index_jobs_col = AsyncCollection(db["index_jobs"])
+tmdb_resolutions_col = AsyncCollection(db["tmdb_resolutions"])
+tmdb_cache_col = AsyncCollection(db["tmdb_cache"])
+imdb_cache_col = AsyncCollection(db["imdb_cache"])
+
+
+# Write-behind batchers for the ingestion upserts
+files_writer = BulkWriter(files_col)
+tmdb_writer = BulkWriter(tmdb_col)
+
+
+async def db_command(*args, **kwargs):
+    return await run_sync(db.command, *args, **kwargs)
+
+async def ensure_unique_index(collection, keys):
+    """
+    Create a unique index on keys, replacing a non-unique one with the same
+    key pattern. If existing duplicates prevent it, keep (or create) a plain
+    index instead and log it, so startup never fails on legacy data.
+    """
+    name = "_".join(f"{field}_{direction}" for field, direction in keys)
+    existing = (await collection.index_information()).get(name)
+    if existing and existing.get("unique"):
+        return True
+    try:
+        if existing:
+            await run_sync(collection.sync.drop_index, name)
+        await collection.create_index(keys, unique=True)
+        return True
+    except (DuplicateKeyError, OperationFailure) as e:
+        logger.warning(f"Unique index {collection.name}.{name} not created, duplicates exist: {e}")
+        await collection.create_index(keys)
+        return False
+
+async def ensure_indexes():
+    """Create the indexes the bot relies on (no-op if they already exist)."""
+    indexes = await files_col.index_information()
+    if "file_name_text" not in indexes:
+        await files_col.create_index([("file_name", "text")])
+    # One document per channel message; keyset pagination walks this too
+    await ensure_unique_index(files_col, [("channel_id", 1), ("message_id", 1)])
+    # Duplicate check on ingest: one file name per channel
+    await ensure_unique_index(files_col, [("channel_id", 1), ("file_name", 1)])
+    # Normalized title fields: token/prefix lookups and year/season filters become index range scans
+    await files_col.create_index([("title_tokens", 1), ("channel_id", 1)])
+    await files_col.create_index([("channel_id", 1), ("title_norm", 1)])
+    await files_col.create_index([("year", 1), ("season", 1), ("episode", 1)])
+    await index_jobs_col.create_index([("status", 1), ("created_at", 1)])
+    # Title -> TMDB id resolutions expire on their own (hits and misses have different TTLs)
+    await tmdb_resolutions_col.create_index([("expires_at", 1)], expireAfterSeconds=0)
+    # TMDB response cache evicts least recently used entries first
+    await tmdb_cache_col.create_index([("last_used", 1)])
+    # IMDb details are kept for good; only "not found" entries carry an expires_at
+    await imdb_cache_col.create_index([("expires_at", 1)], expireAfterSeconds=0)
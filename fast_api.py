@@ -1,7 +1,35 @@
-from fastapi import FastAPI
+import gzip
+import json
+import hashlib
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from config import MY_DOMAIN
+from fastapi.responses import JSONResponse, Response
+from config import MY_DOMAIN, BOT_USERNAME
+from db import files_col
+from utility import (
+    channel_registry, generate_telegram_link,
+    get_search_result_ids, fetch_file_docs, get_search_facets, search_results_capped
+)
+from search_engine import search_index, SUGGEST_LIMIT, format_facet_filters
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# =========================
+# Constants & Globals
+# =========================
+
+API_DEFAULT_LIMIT = 20
+API_MAX_LIMIT = 100
+COMPRESS_MIN_BYTES = 1024
+API_FILE_PROJECTION = {"_id": 0, "channel_id": 1, "message_id": 1, "file_name": 1, "file_size": 1, "file_format": 1}
 
 
 api = FastAPI()
@@ -11,10 +39,148 @@ api.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# =========================
+# Response Helpers
+# =========================
+
+def dump_json(payload):
+    if orjson:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), default=str).encode()
+
+def etag_matches(request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+def cached_json_response(request, payload, max_age=30):
+    """
+    Serialize payload with the fastest available encoder, answer 304 when the
+    client already has it (ETag/If-None-Match), otherwise brotli/gzip compress.
+    """
+    body = dump_json(payload)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    accepted = request.headers.get("accept-encoding", "")
+    if len(body) >= COMPRESS_MIN_BYTES:
+        if brotli and "br" in accepted:
+            body = brotli.compress(body, quality=5)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def api_file(doc):
+    return {
+        "message_id": doc["message_id"],
+        "file_name": doc.get("file_name"),
+        "file_size": doc.get("file_size"),
+        "file_format": doc.get("file_format"),
+        "telegram_link": generate_telegram_link(BOT_USERNAME, doc["channel_id"], doc["message_id"]),
+    }
+
+def parse_int(value, name):
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+
+# =========================
+# Routes
+# =========================
+
 @api.get("/")
 async def root():
     """Greet users on root route."""
     return JSONResponse({"message": "👋 Hello! Welcome to the Sharing Bot"})
 
+@api.get("/api/channels")
+async def list_channels(request: Request):
+    """List allowed channels from the in-memory registry."""
+    return cached_json_response(request, {"channels": channel_registry.items()}, max_age=300)
+
+@api.get("/api/suggest")
+async def suggest_titles(request: Request, q: str = "", limit: int = SUGGEST_LIMIT):
+    """Type-ahead: most popular indexed titles starting with q."""
+    limit = max(1, min(limit, 20))
+    return cached_json_response(request, {"suggestions": search_index.suggestions.suggest(q, limit)}, max_age=60)
+
+def filtered_query(q, format=None, year=None, season=None, size=None):
+    """Fold facet query parameters into q as facet:value filters."""
+    filters = {
+        "format": format,
+        "year": parse_int(year, "year"),
+        "season": parse_int(season, "season"),
+        "size": size,
+    }
+    filters = {facet: value for facet, value in filters.items() if value not in (None, "")}
+    return f"{q.strip()} {format_facet_filters(filters)}".strip()
+
+@api.get("/api/facets")
+async def list_facets(request: Request, q: str = "", channel_id: int = None):
+    """Facet counts (format/year/season/size) for a query, or for a channel's whole catalog."""
+    if channel_id is not None and channel_id not in channel_registry:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    facets = await get_search_facets(q, channel_id)
+    # year/season values are ints; JSON object keys must be strings
+    facets = {facet: {str(value): count for value, count in counts.items()} for facet, counts in facets.items()}
+    return cached_json_response(request, {"facets": facets})
+
+@api.get("/api/channel/{channel_id}/files")
+async def list_channel_files(request: Request, channel_id: int, q: str = "", offset: int = 0,
+                             limit: int = API_DEFAULT_LIMIT, cursor: str = None,
+                             format: str = None, year: str = None, season: str = None, size: str = None):
+    """
+    Page through a channel's files, newest first, or through search results when q is set.
+    - Browsing uses keyset pagination: cursor is the last message_id of the previous page.
+    - Searching slices the cached, materialized hit list: cursor is the next offset.
+    - format/year/season/size narrow either listing; filtered browsing goes through search.
+    offset is still honoured for clients that don't send a cursor.
+    """
+    if channel_id not in channel_registry:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    limit = max(1, min(limit, API_MAX_LIMIT))
+    cursor = parse_int(cursor, "cursor")
+    q = filtered_query(q, format, year, season, size)
+
+    if q:
+        start = cursor if cursor is not None else max(0, offset)
+        result_ids = await get_search_result_ids(q, channel_id)
+        docs = await fetch_file_docs(result_ids[start:start + limit])
+        has_more = start + limit < len(result_ids)
+        next_cursor = str(start + limit) if has_more else None
+        truncated = search_results_capped(result_ids)
+    else:
+        files_filter = {"channel_id": channel_id}
+        if cursor is not None:
+            files_filter["message_id"] = {"$lt": cursor}
+        files_cursor = files_col.find(files_filter, API_FILE_PROJECTION).sort("message_id", -1)
+        if cursor is None and offset > 0:
+            files_cursor = files_cursor.skip(offset)
+        docs = await files_cursor.limit(limit + 1).to_list()
+        has_more = len(docs) > limit
+        truncated = False
+        docs = docs[:limit]
+        next_cursor = str(docs[-1]["message_id"]) if has_more else None
+
+    return cached_json_response(request, {
+        "files": [api_file(doc) for doc in docs],
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+        # Search hits stop at the Mongo fallback's limit until the index is built
+        "truncated": truncated,
+    })
@@ -0,0 +1,119 @@
+import json
+import time
+import asyncio
+import sqlite3
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DurableQueue:
+    """
+    On-disk log of files waiting to be ingested (SQLite in WAL mode).
+    - put() records an item keyed by (channel_id, message_id); a key that is
+      already pending or leased is ignored, so re-queueing is deduplicated.
+    - lease() marks an item as being processed and counts the attempt;
+      ack() deletes it once processing finished.
+    - recover() runs on startup: items leased by a process that died go back
+      to pending and are returned for replay (at-least-once delivery).
+    - Items that fail max_attempts times are kept with status 'failed'.
+    All calls run on one dedicated thread, so the event loop never waits on disk.
+    """
+
+    def __init__(self, path, max_attempts=5):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-queue")
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS items (
+                channel_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL,
+                leased_at REAL,
+                error TEXT,
+                PRIMARY KEY (channel_id, message_id)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_status ON items (status, enqueued_at)")
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    def _put(self, channel_id, message_id, payload):
+        cursor = self._conn.execute(
+            """INSERT INTO items (channel_id, message_id, payload, enqueued_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT (channel_id, message_id) DO UPDATE SET
+                   payload = excluded.payload, status = 'pending', attempts = 0,
+                   enqueued_at = excluded.enqueued_at, error = NULL
+               WHERE items.status = 'failed'""",
+            (channel_id, message_id, json.dumps(payload), time.time())
+        )
+        return cursor.rowcount > 0
+
+    async def put(self, channel_id, message_id, payload):
+        """Record an item; False if the same message is already queued."""
+        return await self._run(self._put, channel_id, message_id, payload)
+
+    def _lease(self, channel_id, message_id):
+        self._conn.execute(
+            "UPDATE items SET status = 'leased', attempts = attempts + 1, leased_at = ? "
+            "WHERE channel_id = ? AND message_id = ?",
+            (time.time(), channel_id, message_id)
+        )
+
+    async def lease(self, channel_id, message_id):
+        await self._run(self._lease, channel_id, message_id)
+
+    def _ack(self, channel_id, message_id):
+        self._conn.execute(
+            "DELETE FROM items WHERE channel_id = ? AND message_id = ?",
+            (channel_id, message_id)
+        )
+
+    async def ack(self, channel_id, message_id):
+        await self._run(self._ack, channel_id, message_id)
+
+    def _fail(self, channel_id, message_id, error):
+        """Processing raised: back to pending for a retry, or give up after max_attempts."""
+        self._conn.execute(
+            "UPDATE items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ? WHERE channel_id = ? AND message_id = ?",
+            (self.max_attempts, error, channel_id, message_id)
+        )
+        row = self._conn.execute(
+            "SELECT status, attempts FROM items WHERE channel_id = ? AND message_id = ?",
+            (channel_id, message_id)
+        ).fetchone()
+        return row[1] if row and row[0] == "pending" else None
+
+    async def fail(self, channel_id, message_id, error):
+        """Attempts made so far if the item should be retried, None once it has failed for good."""
+        return await self._run(self._fail, channel_id, message_id, str(error))
+
+    def _recover(self):
+        self._conn.execute(
+            "UPDATE items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END "
+            "WHERE status = 'leased'",
+            (self.max_attempts,)
+        )
+        rows = self._conn.execute(
+            "SELECT payload FROM items WHERE status = 'pending' ORDER BY enqueued_at"
+        ).fetchall()
+        return [json.loads(payload) for payload, in rows]
+
+    async def recover(self):
+        """Payloads of every unfinished item, oldest first."""
+        return await self._run(self._recover)
+
+    def _counts(self):
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall()
+        return dict(rows)
+
+    async def counts(self):
+        return await self._run(self._counts)
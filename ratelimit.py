@@ -0,0 +1,121 @@
+import time
+import asyncio
+
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter.
+    - Tokens refill continuously at `rate` per second up to `capacity` (the burst size).
+    - acquire() waits just long enough for the requested tokens; waiters are served in order.
+    - Usable as `async with bucket:` for a single token.
+    """
+
+    def __init__(self, rate, capacity=None, name=""):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.name = name
+        self.tokens = self.capacity
+        self.acquired = 0
+        self.waits = 0
+        self.waited_seconds = 0.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        """Wait until `tokens` are available and take them."""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            if self.tokens < tokens:
+                delay = (tokens - self.tokens) / self.rate
+                self.waits += 1
+                self.waited_seconds += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self.tokens -= tokens
+            self.acquired += tokens
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "rate": self.rate,
+            "acquired": self.acquired,
+            "waits": self.waits,
+            "waited_seconds": self.waited_seconds,
+        }
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a while.
+    - closed: calls allowed; `threshold` consecutive failures open the breaker.
+    - open: allow() is False until `reset_timeout` seconds have passed.
+    - half-open: one trial call is allowed; success closes, failure re-opens.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=300, name=""):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+        self._trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial:
+            self._trial = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def release(self):
+        """A call ended without an outcome (cancelled); a half-open breaker may trial again."""
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial or self.failures >= self.threshold:
+            if self.opened_at is None or self._trial:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+            self._trial = False
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,149 @@
+import re
+from datetime import datetime
+
+# =========================
+# Release Name Parser
+# =========================
+# parse_release() tokenizes a caption with one compiled regex and classifies
+# each token (or adjacent pair) by table lookup: S01E02, 1x02, Season 1, year,
+# 1080p, x265, WEB-DL, Hindi... The title is whatever precedes the last year
+# (tag words before it belong to the title), or the first marker when there is
+# no year; a year opening the caption stays in the title.
+
+MIN_YEAR = 1900
+MAX_YEAR = datetime.now().year + 2  # Allow a couple of years ahead for upcoming movies
+
+QUALITIES = {"480p": "480p", "576p": "576p", "720p": "720p", "1080p": "1080p",
+             "1080i": "1080p", "1440p": "1440p", "2160p": "2160p", "4k": "2160p", "uhd": "2160p"}
+CODECS = {"x264": "x264", "h264": "x264", "h 264": "x264", "avc": "x264",
+          "x265": "x265", "h265": "x265", "h 265": "x265", "hevc": "x265",
+          "av1": "av1", "xvid": "xvid", "vp9": "vp9"}
+SOURCES = {"bluray": "bluray", "blu ray": "bluray", "bdrip": "bluray", "brrip": "bluray", "bdremux": "bluray",
+           "remux": "bluray", "web dl": "web-dl", "webdl": "web-dl", "webrip": "webrip", "web": "web-dl",
+           "hdrip": "hdrip", "dvdrip": "dvdrip", "dvd": "dvdrip", "hdtv": "hdtv", "hdcam": "cam",
+           "camrip": "cam", "cam": "cam", "hdts": "telesync", "telesync": "telesync", "predvd": "cam"}
+LANGUAGES = ("hindi", "english", "tamil", "telugu", "malayalam", "kannada", "bengali", "marathi",
+             "punjabi", "gujarati", "urdu", "korean", "japanese", "chinese", "spanish", "french",
+             "german", "italian", "russian", "arabic", "turkish", "dual audio", "multi audio")
+
+
+# Single-token markers: lowercased token -> (field, normalized value)
+MARKERS = {}
+# Two-token markers, written as "first second" ("web dl", "h 264", "dual audio")
+PAIR_MARKERS = {}
+for _field, _table in (("quality", QUALITIES), ("codec", CODECS), ("source", SOURCES),
+                       ("language", {language: language for language in LANGUAGES})):
+    for _name, _value in _table.items():
+        (PAIR_MARKERS if " " in _name else MARKERS)[_name] = (_field, _value)
+
+PAIR_FIRSTS = {name.split(" ")[0] for name in PAIR_MARKERS}
+EPISODE_TOKEN_STARTS = set("se0123456789")
+# Tokens that can start a marker at all; anything else is a title word
+MARKER_WORDS = set(MARKERS) | PAIR_FIRSTS
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+# S01, S01E02, S01E02E03, 1x02, E05, EP05 as a single token
+EPISODE_TOKEN_RE = re.compile(
+    r"s(?P<s>\d{1,2})(?:ep?(?P<e>\d{1,3})(?:e\d{1,3})*)?|(?P<xs>\d{1,2})x(?P<xe>\d{2,3})|ep?(?P<ee>\d{1,3})"
+)
+AKA_RE = re.compile(r"\s+a\s?k\s?a\s+", re.IGNORECASE)
+SEPARATORS_RE = re.compile(r"[._\s]+")
+LEADING_TAGS_RE = re.compile(r"^\s*(?:\[[^\]]*\]|\{[^}]*\}|@\w+)\s*[-:|]?\s*")
+TITLE_TRIM = " -_.([{|:,)]}"
+
+
+def clean_title(text):
+    text = SEPARATORS_RE.sub(" ", text.replace("(", " ").replace(")", " "))
+    if " a" in text or " A" in text:
+        text = AKA_RE.split(text, 1)[0]
+    return text.strip(TITLE_TRIM)
+
+
+def parse_release(caption):
+    """
+    Parse a release name / caption in one scan.
+    Returns a dict with title, year, season and episode ("01"-style strings,
+    as extract_movie_info always returned) plus quality, codec, source and
+    language (normalized, or None).
+    """
+    info = {"title": None, "year": None, "season": None, "episode": None,
+            "quality": None, "codec": None, "source": None, "language": None}
+    if not caption:
+        return info
+    if caption[0] in "[{@ ":
+        caption = LEADING_TAGS_RE.sub("", caption)
+    tokens = TOKEN_RE.findall(caption.lower())
+    count = len(tokens)
+    tags = []  # (token index, field, value) of quality/codec/source/language words
+    first_episode = None  # token index of the first season/episode marker
+    year_index = None
+    i = 0
+    while i < count:
+        token = tokens[i]
+        index = i
+        i += 1
+        if token[0] not in EPISODE_TOKEN_STARTS and token not in MARKER_WORDS:
+            continue
+        marker = None
+        if token in PAIR_FIRSTS and i < count:
+            marker = PAIR_MARKERS.get(token + " " + tokens[i])
+            if marker:
+                i += 1
+        if marker is None:
+            marker = MARKERS.get(token)
+        if marker is not None:
+            tags.append((index, *marker))
+            continue
+        if token.isdigit():
+            if len(token) == 4 and MIN_YEAR <= int(token) <= MAX_YEAR:
+                # The last year wins, but one opening the caption is part of the title ("1917 2019")
+                if year_index is None or index > 0:
+                    info["year"], year_index = token, index
+            continue
+        if (token == "season" or token == "episode") and i < count and tokens[i].isdigit() and len(tokens[i]) <= 3:
+            if info[token] is None:
+                info[token] = f"{int(tokens[i]):02d}"
+            i += 1
+        elif token[0] in EPISODE_TOKEN_STARTS and (match := EPISODE_TOKEN_RE.fullmatch(token)):
+            season = match["s"] or match["xs"]
+            episode = match["e"] or match["xe"] or match["ee"]
+            if season and info["season"] is None:
+                info["season"] = f"{int(season):02d}"
+            if episode and info["episode"] is None:
+                info["episode"] = f"{int(episode):02d}"
+        else:
+            continue
+        if first_episode is None:
+            first_episode = index
+
+    # Tag words before the year are part of the title ("The French Connection 1971",
+    # "Charlotte's Web 2006"); without a year the first tag ends the title
+    first_tag = None
+    for index, field, value in tags:
+        if year_index and index < year_index:
+            continue
+        if first_tag is None:
+            first_tag = index
+        if info[field] is None:
+            info[field] = value
+
+    cut = count
+    if year_index:
+        cut = year_index
+    elif first_tag:
+        cut = first_tag
+    if first_episode:
+        cut = min(cut, first_episode)
+    if cut < count:
+        # Map the cut token back to its offset in the original caption
+        for position, match in enumerate(TOKEN_RE.finditer(caption)):
+            if position == cut:
+                info["title"] = clean_title(caption[:match.start()])
+                break
+    info["title"] = info["title"] or clean_title(caption)
+    return info
+
+
+def parse_releases(captions):
+    """Batch form of parse_release() for backfills and /index runs."""
+    return [parse_release(caption) for caption in captions]
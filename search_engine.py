@@ -0,0 +1,723 @@
+import re
+import math
+import time
+import heapq
+import asyncio
+import functools
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from config import logger
+from cache import LRUCache
+from db import files_col
+from release_parser import parse_releases
+
+# =========================
+# Constants & Globals
+# =========================
+
+INDEX_BUILD_BATCH_SIZE = 2000
+DOC_PROJECTION = {
+    "_id": 0, "channel_id": 1, "message_id": 1,
+    "file_name": 1, "file_size": 1, "file_format": 1, "title_norm": 1,
+    "year": 1, "season": 1
+}
+
+# Weights for a query token matching a vocabulary token
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.75
+SUBSTRING_WEIGHT = 0.5
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Fuzzy matching: title tokens get a SymSpell-style deletion dictionary
+FUZZY_MAX_EDIT_DISTANCE = 2
+FUZZY_PREFIX_LENGTH = 6
+FUZZY_MIN_TOKEN_LENGTH = 4
+FUZZY_MAX_CANDIDATES = 500
+
+# Autocomplete over normalized titles
+SUGGEST_LIMIT = 8
+SUGGEST_MAX_TITLES = 500000
+SUGGEST_MAX_SCAN = 2000  # Prefix ranges larger than this use a cached top list
+SUGGEST_TOP_CACHE_SIZE = 5000
+SUGGEST_HIT_WEIGHT = 5  # A search for a title counts as this many files
+
+# Facets: filter with "format:mkv size:1-2gb year:2019 season:1" in the query
+FACETS = ("format", "size", "year", "season")
+FACET_FILTER_RE = re.compile(r"\b(format|size|year|season):(\S+)", re.IGNORECASE)
+FORMAT_ALIASES = {
+    "video/x-matroska": "mkv", "video/mp4": "mp4", "video/webm": "webm",
+    "video/x-msvideo": "avi", "audio/mpeg": "mp3", "audio/flac": "flac",
+    "audio/x-flac": "flac", "audio/mp4": "m4a", "image/jpeg": "jpg",
+    "application/zip": "zip", "application/vnd.rar": "rar",
+    "application/x-rar-compressed": "rar", "application/pdf": "pdf",
+}
+SIZE_BANDS = (  # (label, upper bound in bytes)
+    ("lt500mb", 500 * 1024 ** 2),
+    ("500mb-1gb", 1024 ** 3),
+    ("1-2gb", 2 * 1024 ** 3),
+    ("2-4gb", 4 * 1024 ** 3),
+    ("gt4gb", None),
+)
+
+# Queries run on their own threads so broad terms ("1080p") never stall the
+# event loop; a query broken by a concurrent add()/remove() is retried
+SEARCH_WORKERS = 2
+SEARCH_RETRIES = 3
+
+# Bot API channel ids are -100<channel>; the bare channel id fits in 32 bits
+CHANNEL_ID_OFFSET = -1000000000000
+
+# =========================
+# Result Keys
+# =========================
+
+def is_channel_id(channel_id):
+    """True for a Bot API channel / supergroup id (-100<channel>)."""
+    return channel_id < CHANNEL_ID_OFFSET
+
+def pack_key(channel_id, message_id):
+    """
+    Pack (channel_id, message_id) into one int: unsigned 64-bit for channel
+    ids up to -100<2**32>, a wider (possibly negative) int for anything else.
+    """
+    return ((CHANNEL_ID_OFFSET - channel_id) << 32) | message_id
+
+def unpack_key(packed):
+    return CHANNEL_ID_OFFSET - (packed >> 32), packed & 0xFFFFFFFF
+
+def pack_keys(keys):
+    """
+    Pack an ordered iterable of (channel_id, message_id) into a compact array.
+    A key from a non-channel id doesn't fit an unsigned 64-bit slot; the list
+    of ints is returned as is then, so those results still page and unpack.
+    """
+    packed = [pack_key(channel_id, message_id) for channel_id, message_id in keys]
+    try:
+        return array("Q", packed)
+    except OverflowError:
+        return packed
+
+def rank_hits(hits):
+    """
+    Sort [(key, score), ...] in place: best score first, then newest message_id,
+    then channel_id. Three stable single-key passes instead of one tuple key:
+    each C-level sort holds the GIL far shorter, which keeps the event loop
+    responsive while a search thread ranks a broad query.
+    """
+    hits.sort(key=lambda item: item[0][0])
+    hits.sort(key=lambda item: item[0][1], reverse=True)
+    hits.sort(key=lambda item: item[1], reverse=True)
+    return hits
+
+# =========================
+# Tokenizing
+# =========================
+
+def tokenize(text):
+    """Lowercase and split a file name into alphanumeric tokens."""
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+def trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+# =========================
+# Normalized Fields
+# =========================
+
+# Normalized fields the index reads (suggestions and year/season facets)
+INDEXED_NORMALIZED_FIELDS = ("title_norm", "year", "season")
+
+def build_normalized_fields(title, year=None, season=None, episode=None):
+    """
+    Indexable fields derived from extract_movie_info() output:
+    lowercased, de-punctuated title tokens plus numeric year/season/episode.
+    """
+    tokens = tokenize(title)
+    return {
+        "title_norm": " ".join(tokens),
+        "title_tokens": tokens,
+        "year": int(year) if year else None,
+        "season": int(season) if season else None,
+        "episode": int(episode) if episode else None,
+    }
+
+def normalize_file_names(file_names):
+    """Normalized fields for a batch of file names, built on parse_releases()."""
+    return [
+        build_normalized_fields(info["title"], info["year"], info["season"], info["episode"])
+        for info in parse_releases([file_name or "" for file_name in file_names])
+    ]
+
+def with_normalized_fields(doc):
+    """
+    doc with any normalized field it lacks derived from file_name. Files saved
+    before those fields existed are indexed (titles, year/season facets) the
+    same way the backfill will store them.
+    """
+    if all(field in doc for field in INDEXED_NORMALIZED_FIELDS):
+        return doc
+    derived = normalize_file_names([doc.get("file_name")])[0]
+    return {**derived, **doc}
+
+# =========================
+# Facets
+# =========================
+
+def format_facet(mime_type):
+    if not mime_type:
+        return None
+    return FORMAT_ALIASES.get(mime_type, mime_type.rsplit("/", 1)[-1].lower())
+
+def size_band(file_size):
+    if not file_size:
+        return None
+    for label, upper in SIZE_BANDS:
+        if upper is None or file_size < upper:
+            return label
+
+def size_band_range(label):
+    """Return (lower, upper) byte bounds of a size band; upper is None for the last band."""
+    lower = 0
+    for band, upper in SIZE_BANDS:
+        if band == label:
+            return lower, upper
+        lower = upper
+    return None
+
+def facet_values(doc):
+    """Facet -> value for a file doc, skipping facets the doc has no value for."""
+    values = {
+        "format": format_facet(doc.get("file_format")),
+        "size": size_band(doc.get("file_size")),
+        "year": doc.get("year"),
+        "season": doc.get("season"),
+    }
+    return {facet: value for facet, value in values.items() if value is not None}
+
+def parse_facet_filters(query):
+    """Split "avengers year:2019 format:mkv" into ("avengers", {"year": 2019, "format": "mkv"})."""
+    filters = {}
+    for facet, value in FACET_FILTER_RE.findall(query or ""):
+        facet = facet.lower()
+        value = value.lower()
+        if facet in ("year", "season"):
+            if not value.isdigit():
+                continue
+            value = int(value)
+        filters[facet] = value
+    return FACET_FILTER_RE.sub(" ", query or "").strip(), filters
+
+def format_facet_filters(filters):
+    return " ".join(f"{facet}:{value}" for facet, value in filters.items())
+
+# =========================
+# Fuzzy Matching
+# =========================
+
+def edit_distance(a, b, max_distance):
+    """
+    Optimal string alignment distance between a and b, giving up early:
+    returns max_distance + 1 as soon as the distance must exceed max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        before, previous = previous, current
+    return previous[-1]
+
+def fuzzy_eligible(token):
+    return len(token) >= FUZZY_MIN_TOKEN_LENGTH and token.isalpha()
+
+def max_distance_for(token):
+    return 1 if len(token) <= 5 else FUZZY_MAX_EDIT_DISTANCE
+
+
+class SymSpell:
+    """
+    Deletion dictionary for typo lookups (SymSpell).
+    Every word is stored under all strings reachable by deleting up to
+    max_distance characters from its prefix, so a lookup only generates the
+    deletes of the query term instead of scanning the vocabulary.
+    """
+
+    def __init__(self, max_distance=FUZZY_MAX_EDIT_DISTANCE, prefix_length=FUZZY_PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.words = set()
+        self.deletes = defaultdict(set)
+
+    def __len__(self):
+        return len(self.words)
+
+    def _edits(self, word):
+        edits = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+            edits |= frontier
+        return edits
+
+    def add(self, word):
+        if word in self.words:
+            return
+        self.words.add(word)
+        for edit in self._edits(word[:self.prefix_length]):
+            self.deletes[edit].add(word)
+
+    def remove(self, word):
+        if word not in self.words:
+            return
+        self.words.discard(word)
+        for edit in self._edits(word[:self.prefix_length]):
+            words = self.deletes.get(edit)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self.deletes[edit]
+
+    def lookup(self, term, max_distance=None):
+        """Return [(word, distance), ...] within max_distance of term, closest first."""
+        max_distance = self.max_distance if max_distance is None else max_distance
+        candidates = set()
+        for edit in self._edits(term[:self.prefix_length]):
+            words = self.deletes.get(edit)
+            if words:
+                candidates |= words
+                if len(candidates) >= FUZZY_MAX_CANDIDATES:
+                    break
+        matches = []
+        for word in candidates:
+            distance = edit_distance(term, word, max_distance)
+            if distance <= max_distance:
+                matches.append((word, distance))
+        matches.sort(key=lambda match: match[1])
+        return matches
+
+# =========================
+# Autocomplete
+# =========================
+
+class SuggestIndex:
+    """
+    Sorted-array prefix index of normalized titles (title_norm).
+    A prefix maps to a contiguous slice found with two bisects; the slice is
+    ranked by popularity = files with that title + SUGGEST_HIT_WEIGHT * searches.
+    Broad prefixes (huge slices) are ranked once and cached until a title
+    under them is added or removed.
+    """
+
+    def __init__(self, max_titles=SUGGEST_MAX_TITLES):
+        self.max_titles = max_titles
+        self.titles = []
+        self.counts = {}
+        self.hits = {}
+        self._top = LRUCache(max_entries=SUGGEST_TOP_CACHE_SIZE)
+        self._sorted = True
+
+    def __len__(self):
+        return len(self.titles)
+
+    def defer_sorting(self):
+        """Bulk load: add() appends, and finish_sorting() sorts once at the end."""
+        self._sorted = False
+
+    def finish_sorting(self):
+        self.titles.sort()
+        self._top.clear()
+        self._sorted = True
+
+    def popularity(self, title):
+        return self.counts.get(title, 0) + SUGGEST_HIT_WEIGHT * self.hits.get(title, 0)
+
+    def _changed(self, title):
+        self._top.invalidate(lambda prefix: title.startswith(prefix))
+
+    def add(self, title):
+        if not title:
+            return
+        if title in self.counts:
+            self.counts[title] += 1
+            return
+        if len(self.titles) >= self.max_titles:
+            return
+        self.counts[title] = 1
+        if not self._sorted:
+            self.titles.append(title)
+            return
+        insort(self.titles, title)
+        self._changed(title)
+
+    def remove(self, title):
+        count = self.counts.get(title)
+        if count is None:
+            return
+        if count > 1:
+            self.counts[title] = count - 1
+            return
+        del self.counts[title]
+        self.hits.pop(title, None)
+        if not self._sorted:
+            self.titles.remove(title)
+            return
+        i = bisect_left(self.titles, title)
+        if i < len(self.titles) and self.titles[i] == title:
+            del self.titles[i]
+        self._changed(title)
+
+    def record_hit(self, title):
+        if title not in self.counts:
+            return
+        self.hits[title] = self.hits.get(title, 0) + 1
+        # Keep cached top lists of the title's prefixes in step with its new
+        # popularity: re-rank it if listed, or let it displace the last entry
+        popularity = self.popularity(title)
+        for end in range(1, len(title) + 1):
+            top = self._top.get(title[:end], count=False)
+            if not top:
+                continue
+            if title not in top:
+                if popularity <= self.popularity(top[-1]):
+                    continue
+                top[-1] = title
+            top.sort(key=self.popularity, reverse=True)
+
+    def suggest(self, prefix, limit=SUGGEST_LIMIT):
+        """Return up to limit titles starting with prefix, most popular first."""
+        prefix = " ".join(tokenize(prefix))
+        if not prefix:
+            return []
+        lo = bisect_left(self.titles, prefix)
+        hi = bisect_left(self.titles, prefix + "\uffff", lo)
+        if hi - lo <= SUGGEST_MAX_SCAN:
+            return heapq.nlargest(limit, self.titles[lo:hi], key=self.popularity)
+        top = self._top.get(prefix)
+        if top is None or len(top) < limit:
+            top = heapq.nlargest(max(limit, SUGGEST_LIMIT), self.titles[lo:hi], key=self.popularity)
+            self._top.set(prefix, top)
+        return top[:limit]
+
+# =========================
+# Inverted Index
+# =========================
+
+class SearchIndex:
+    """
+    In-memory token/trigram inverted index of files_col.file_name.
+    - postings maps a token to the (channel_id, message_id) keys containing it.
+    - grams maps a trigram to the vocabulary tokens containing it, so partial
+      words ("aveng") still match without scanning the vocabulary.
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self.postings = defaultdict(set)
+        self.grams = defaultdict(set)
+        self.fuzzy = SymSpell()
+        self.suggestions = SuggestIndex()
+        # (facet, value) -> keys, key -> ((facet, value), ...) and channel_id -> facet -> Counter(value)
+        self.facet_postings = defaultdict(set)
+        self.doc_facets = {}
+        self.facet_counts = defaultdict(lambda: defaultdict(Counter))
+        self.ready = False
+        self.last_error = None
+        self._building = False
+        self._pending = []
+
+    def __len__(self):
+        return len(self.docs)
+
+    # ---- Updates ----
+
+    def add(self, file_info):
+        """Index (or re-index) a file document."""
+        if self._building:
+            self._pending.append(("add", (file_info,)))
+        key = (file_info["channel_id"], file_info["message_id"])
+        if key in self.docs:
+            self._discard(key)
+        file_info = with_normalized_fields(file_info)
+        self.docs[key] = {field: file_info.get(field) for field in DOC_PROJECTION if field != "_id"}
+        self.suggestions.add(file_info.get("title_norm"))
+        facet_items = tuple(facet_values(file_info).items())
+        self.doc_facets[key] = facet_items
+        for facet, value in facet_items:
+            self.facet_postings[(facet, value)].add(key)
+            self.facet_counts[key[0]][facet][value] += 1
+        for token in set(tokenize(file_info.get("file_name"))):
+            keys = self.postings[token]
+            if not keys:
+                for gram in trigrams(token):
+                    self.grams[gram].add(token)
+                if fuzzy_eligible(token):
+                    self.fuzzy.add(token)
+            keys.add(key)
+
+    def remove(self, channel_id, message_id):
+        """Drop a file from the index. Returns True if it was indexed."""
+        if self._building:
+            self._pending.append(("remove", (channel_id, message_id)))
+        return self._discard((channel_id, message_id))
+
+    def _discard(self, key):
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return False
+        self.suggestions.remove(doc.get("title_norm"))
+        for facet, value in self.doc_facets.pop(key, ()):
+            keys = self.facet_postings.get((facet, value))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.facet_postings[(facet, value)]
+            counts = self.facet_counts[key[0]][facet]
+            counts[value] -= 1
+            if counts[value] <= 0:
+                del counts[value]
+        for token in set(tokenize(doc.get("file_name"))):
+            keys = self.postings.get(token)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self.postings[token]
+                self.fuzzy.remove(token)
+                for gram in trigrams(token):
+                    tokens = self.grams.get(gram)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self.grams[gram]
+        return True
+
+    # ---- Queries ----
+
+    def _expand(self, term):
+        """Map a query token to {vocabulary token: weight}."""
+        matches = {}
+        if term in self.postings:
+            matches[term] = EXACT_WEIGHT
+        if len(term) < 3:
+            return matches
+        candidates = None
+        for gram in sorted(trigrams(term), key=lambda g: len(self.grams.get(g, ()))):
+            tokens = self.grams.get(gram)
+            if not tokens:
+                return matches
+            candidates = set(tokens) if candidates is None else candidates & tokens
+            if not candidates:
+                return matches
+        for token in candidates:
+            if token != term and term in token:
+                matches[token] = PREFIX_WEIGHT if token.startswith(term) else SUBSTRING_WEIGHT
+        return matches
+
+    def _filter_keys(self, filters):
+        """Keys matching every facet filter, intersecting the smallest sets first."""
+        sets = sorted((self.facet_postings.get(item, set()) for item in filters.items()), key=len)
+        keys = set(sets[0])
+        for other in sets[1:]:
+            keys &= other
+        return keys
+
+    def search(self, query, channel_ids=None):
+        """
+        Return [(key, score), ...] for files matching every query token and
+        facet filter, best first, ties broken by newest message_id. A query of
+        only filters lists the matching files newest first.
+        """
+        query, filters = parse_facet_filters(query)
+        allowed = self._filter_keys(filters) if filters else None
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            if allowed is None:
+                return []
+            if channel_ids is not None:
+                channel_ids = set(channel_ids)
+                allowed = {key for key in allowed if key[0] in channel_ids}
+            return rank_hits([(key, 0.0) for key in allowed])
+        total_docs = len(self.docs) or 1
+        per_term = []
+        for term in terms:
+            term_scores = {}
+            for token, weight in self._expand(term).items():
+                # tuple() copies in one step, so add()/remove() on the loop can't
+                # resize the set mid-iteration when this runs on a search thread
+                keys = tuple(self.postings.get(token, ()))
+                if not keys:
+                    continue
+                score = weight * math.log(1 + total_docs / len(keys))
+                for key in keys:
+                    if term_scores.get(key, 0) < score:
+                        term_scores[key] = score
+            if not term_scores:
+                return []
+            per_term.append(term_scores)
+
+        per_term.sort(key=len)
+        scores = per_term[0]
+        if channel_ids is not None:
+            channel_ids = set(channel_ids)
+            scores = {key: score for key, score in scores.items() if key[0] in channel_ids}
+        else:
+            scores = dict(scores)
+        if allowed is not None:
+            scores = {key: score for key, score in scores.items() if key in allowed}
+        for term_scores in per_term[1:]:
+            scores = {key: score + term_scores[key] for key, score in scores.items() if key in term_scores}
+            if not scores:
+                return []
+        return rank_hits(list(scores.items()))
+
+    def search_ids(self, query, channel_ids=None):
+        """Return the full ranked result list as an array of packed keys."""
+        return pack_keys(key for key, _ in self.search(query, channel_ids))
+
+    async def run_off_loop(self, method, *args):
+        """
+        Run a read-only query method on a search thread. add()/remove() keep
+        running on the loop meanwhile; if one resizes a set the query is
+        iterating, the query is retried, and run inline as a last resort.
+        """
+        loop = asyncio.get_running_loop()
+        for _ in range(SEARCH_RETRIES):
+            try:
+                return await loop.run_in_executor(search_executor, functools.partial(method, *args))
+            except RuntimeError as e:
+                if "changed size during iteration" not in str(e):
+                    raise
+                logger.debug(f"Search retried after concurrent index update: {e}")
+        return method(*args)
+
+    async def search_ids_async(self, query, channel_ids=None):
+        return await self.run_off_loop(self.search_ids, query, channel_ids)
+
+    def correct(self, query):
+        """
+        "Did you mean": replace query tokens missing from the vocabulary with their
+        closest known token (ties go to the more common one). Returns None when
+        nothing could be corrected.
+        """
+        query, filters = parse_facet_filters(query)
+        corrected = []
+        changed = False
+        for term in tokenize(query):
+            if term in self.postings or not fuzzy_eligible(term):
+                corrected.append(term)
+                continue
+            matches = self.fuzzy.lookup(term, max_distance_for(term))
+            if not matches:
+                corrected.append(term)
+                continue
+            best = min(matches, key=lambda match: (match[1], -len(self.postings.get(match[0], ()))))
+            corrected.append(best[0])
+            changed = True
+        if not changed:
+            return None
+        return " ".join(corrected + [format_facet_filters(filters)]).strip()
+
+    def channel_facets(self, channel_ids):
+        """Facet counts for whole channels, read from the incrementally maintained tables."""
+        totals = {facet: Counter() for facet in FACETS}
+        for channel_id in channel_ids:
+            for facet, counts in self.facet_counts.get(channel_id, {}).items():
+                totals[facet].update(counts)
+        return {facet: dict(counts.most_common()) for facet, counts in totals.items()}
+
+    def count_facets(self, packed_keys):
+        """Facet counts over a materialized result list (see count_facets_async())."""
+        counts = Counter()
+        doc_facets = self.doc_facets
+        for packed in packed_keys:
+            items = doc_facets.get(unpack_key(packed))
+            if items:
+                counts.update(items)
+        totals = {facet: Counter() for facet in FACETS}
+        for (facet, value), count in counts.items():
+            totals[facet][value] = count
+        return {facet: dict(counts.most_common()) for facet, counts in totals.items()}
+
+    async def count_facets_async(self, packed_keys):
+        """
+        count_facets() on a search thread: a broad query has tens of thousands
+        of hits, and a Python loop over them there never stalls the event loop.
+        """
+        return await self.run_off_loop(self.count_facets, packed_keys)
+
+    def get_doc(self, channel_id, message_id):
+        doc = self.docs.get((channel_id, message_id))
+        return dict(doc) if doc is not None else None
+
+    # ---- Startup build ----
+
+    def _adopt(self, other):
+        self.docs = other.docs
+        self.postings = other.postings
+        self.grams = other.grams
+        self.fuzzy = other.fuzzy
+        self.suggestions = other.suggestions
+        self.facet_postings = other.facet_postings
+        self.doc_facets = other.doc_facets
+        self.facet_counts = other.facet_counts
+
+    @staticmethod
+    def _build_from_db(batch_size):
+        fresh = SearchIndex()
+        # Titles are sorted once at the end instead of insort() per file
+        fresh.suggestions.defer_sorting()
+        for doc in files_col.sync.find({}, DOC_PROJECTION, batch_size=batch_size):
+            if doc.get("file_name"):
+                fresh.add(doc)
+        fresh.suggestions.finish_sorting()
+        return fresh
+
+    async def load(self, batch_size=INDEX_BUILD_BATCH_SIZE):
+        """
+        Build the index from a streaming cursor in a worker thread, then swap it in
+        and replay any add/remove calls that arrived while it was building.
+        Returns True once built; a failure is logged and kept in last_error.
+        """
+        started = time.monotonic()
+        self._building = True
+        self._pending = []
+        try:
+            fresh = await asyncio.to_thread(self._build_from_db, batch_size)
+            self._adopt(fresh)
+            self._building = False
+            for op, args in self._pending:
+                getattr(self, op)(*args)
+            self.ready = True
+            self.last_error = None
+            logger.info(
+                f"Search index built: {len(self.docs)} files, {len(self.postings)} tokens "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Failed to build search index: {e}")
+        finally:
+            self._building = False
+            self._pending = []
+        return self.ready
+
+
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+search_index = SearchIndex()
@@ -1,44 +1,412 @@
 import re
+import json
+import time
+import random
+import asyncio
 import aiohttp
+import threading
 import imdb
-from config import TMDB_API_KEY, logger
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict, deque
+from datetime import datetime, timezone, timedelta
+from config import (
+    TMDB_API_KEY, TMDB_CONNECTION_LIMIT, TMDB_TIMEOUT, TMDB_RETRIES,
+    TMDB_CACHE_MAX_BYTES, IMDB_WORKERS, IMDB_TIMEOUT, IMDB_BREAKER_THRESHOLD,
+    IMDB_BREAKER_COOLDOWN, IMDB_MISS_TTL, logger
+)
+from db import tmdb_cache_col, imdb_cache_col
+from cache import LRUCache
+from ratelimit import CircuitBreaker
 
 POSTER_BASE_URL = 'https://image.tmdb.org/t/p/original'
+TMDB_API_URL = 'https://api.themoviedb.org/3'
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_BASE_DELAY = 0.5  # seconds; doubled per attempt, full jitter
+RETRY_MAX_DELAY = 8
+LATENCY_SAMPLES = 500
 
-def get_cast_and_crew(tmdb_type, movie_id):
+# Response cache freshness per endpoint (see TMDBClient.endpoint()); stale
+# entries are revalidated with ETag / Last-Modified before being refetched
+CACHE_TTLS = {
+    "search/movie": timedelta(days=1),
+    "search/tv": timedelta(days=1),
+    "movie/{id}": timedelta(days=7),
+    "tv/{id}": timedelta(days=3),
+    "tv/{id}/external_ids": timedelta(days=30),
+}
+CACHE_DEFAULT_TTL = timedelta(days=1)
+CACHE_EVICT_EVERY = 100  # stores between size checks
+
+# =========================
+# TMDB Response Cache
+# =========================
+
+class TMDBResponseCache:
+    """
+    TMDB response bodies in Mongo, keyed by endpoint path + query (api key excluded).
+    - Entries carry an expiry from CACHE_TTLS plus the ETag / Last-Modified
+      validators, so a stale entry costs a 304 instead of a full download.
+    - Total body size is kept under max_bytes by evicting least recently
+      used entries.
+    - hits / revalidated / misses and bytes served from cache feed /stats.
+    """
+
+    def __init__(self, collection, max_bytes=TMDB_CACHE_MAX_BYTES):
+        self.collection = collection
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        self._stores = 0
+
+    @staticmethod
+    def key(path, params):
+        query = "&".join(f"{k}={v}" for k, v in sorted(params.items()) if k != "api_key")
+        return f"{path.strip('/')}?{query}"
+
+    async def get(self, key):
+        return await self.collection.find_one({"_id": key})
+
+    async def store(self, key, endpoint, body, etag=None, last_modified=None):
+        now = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "endpoint": endpoint,
+                "body": body,
+                "size": len(body),
+                "etag": etag,
+                "last_modified": last_modified,
+                "expires_at": now + CACHE_TTLS.get(endpoint, CACHE_DEFAULT_TTL),
+                "last_used": now,
+            }},
+            upsert=True
+        )
+        self._stores += 1
+        if self._stores % CACHE_EVICT_EVERY == 0:
+            await self.evict()
+
+    async def served(self, entry, endpoint=None):
+        """
+        Record a hit; a revalidated entry (endpoint given) also gets a fresh expiry.
+        The entry is already in hand, so a failed bookkeeping write is only logged.
+        """
+        now = datetime.now(timezone.utc)
+        update = {"last_used": now}
+        if endpoint is not None:
+            update["expires_at"] = now + CACHE_TTLS.get(endpoint, CACHE_DEFAULT_TTL)
+            self.revalidated += 1
+        else:
+            self.hits += 1
+        self.bytes_saved += entry.get("size", 0)
+        try:
+            await self.collection.update_one({"_id": entry["_id"]}, {"$set": update})
+        except Exception as e:
+            logger.warning(f"TMDB cache write failed: {e}")
+
+    async def evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes."""
+        totals = await self.collection.aggregate([{"$group": {"_id": None, "bytes": {"$sum": "$size"}}}])
+        total = totals[0]["bytes"] if totals else 0
+        if total <= self.max_bytes:
+            return 0
+        target = total - int(self.max_bytes * 0.9)
+        freed, ids = 0, []
+        cursor = self.collection.find({}, {"_id": 1, "size": 1}).sort("last_used", 1)
+        async for doc in cursor:
+            ids.append(doc["_id"])
+            freed += doc.get("size", 0)
+            if freed >= target:
+                break
+        await self.collection.delete_many({"_id": {"$in": ids}})
+        self.evictions += len(ids)
+        return len(ids)
+
+    async def total_bytes(self):
+        totals = await self.collection.aggregate([{"$group": {"_id": None, "bytes": {"$sum": "$size"}}}])
+        return totals[0]["bytes"] if totals else 0
+
+    def stats(self):
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.revalidated) / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "evictions": self.evictions,
+        }
+
+
+# =========================
+# TMDB HTTP Client
+# =========================
+
+class TMDBClient:
     """
-    Fetches the cast and crew details (starring actors and director) for a movie or TV show.
+    Process-wide TMDB API client.
+    - One aiohttp session with a keep-alive connector (DNS cached, per-host
+      connection limit), so lookups reuse warm TLS connections.
+    - get_json() retries timeouts, connection errors, 429 and 5xx with
+      jittered exponential backoff, honouring Retry-After.
+    - Latency, retries and errors are recorded per endpoint for /stats.
+    - With a cache, fresh responses are served from it and stale ones are
+      revalidated with If-None-Match / If-Modified-Since.
+    start() is called from bot.main() and close() on shutdown; a call made
+    before start() opens the session lazily.
     """
-    import requests
-    cast_crew_url = f'https://api.themoviedb.org/3/{tmdb_type}/{movie_id}/credits?api_key={TMDB_API_KEY}&language=en-US'
-    response = requests.get(cast_crew_url)
-    cast_crew_data = response.json()
 
-    starring = [member['name'] for member in cast_crew_data.get('cast', [])[:5]]
-    director = next((member['name'] for member in cast_crew_data.get('crew', []) if member['job'] == 'Director'), 'N/A')
+    def __init__(self, api_key, connection_limit=TMDB_CONNECTION_LIMIT,
+                 timeout=TMDB_TIMEOUT, retries=TMDB_RETRIES, cache=None):
+        self.api_key = api_key
+        self.cache = cache
+        self.connection_limit = connection_limit
+        self.timeout = timeout
+        self.retries = retries
+        self.session = None
+        self.metrics = defaultdict(lambda: {
+            "requests": 0, "errors": 0, "retries": 0, "total_ms": 0.0,
+            "latencies": deque(maxlen=LATENCY_SAMPLES),
+        })
+
+    async def start(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=min(5, self.timeout)),
+            )
+        return self
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    @staticmethod
+    def endpoint(path):
+        """Metric label for a path: numeric ids collapse, movie/123/images -> movie/{id}/images."""
+        return "/".join("{id}" if part.isdigit() else part for part in path.strip("/").split("/"))
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(RETRY_MAX_DELAY, retry_after)
+        return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+    async def get_json(self, path, **params):
+        """GET {TMDB_API_URL}/{path} with the api key and return the decoded JSON body."""
+        endpoint = self.endpoint(path)
+        params = {"api_key": self.api_key, **{k: v for k, v in params.items() if v is not None}}
+        if self.cache is None:
+            status, body, _ = await self._request(path, endpoint, params)
+            return json.loads(body)
+
+        key = self.cache.key(path, params)
+        try:
+            entry = await self.cache.get(key)
+        except Exception as e:
+            logger.warning(f"TMDB cache read failed: {e}")
+            entry = None
+        now = datetime.now(timezone.utc)
+        if entry and entry["expires_at"].replace(tzinfo=timezone.utc) > now:
+            await self.cache.served(entry)
+            return json.loads(entry["body"])
+
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        status, body, response_headers = await self._request(path, endpoint, params, headers)
+        if status == 304 and entry:
+            await self.cache.served(entry, endpoint)
+            return json.loads(entry["body"])
+        self.cache.misses += 1
+        data = json.loads(body)
+        try:
+            await self.cache.store(
+                key, endpoint, body.decode("utf-8"),
+                response_headers.get("ETag"), response_headers.get("Last-Modified")
+            )
+        except Exception as e:
+            logger.warning(f"TMDB cache write failed: {e}")
+        return data
+
+    async def _request(self, path, endpoint, params, headers=None):
+        """One GET with retries; returns (status, body bytes, response headers)."""
+        await self.start()
+        metric = self.metrics[endpoint]
+        url = f"{TMDB_API_URL}/{path.strip('/')}"
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            retry_after = None
+            try:
+                async with self.session.get(url, params=params, headers=headers) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.retries:
+                        header = response.headers.get("Retry-After")
+                        retry_after = float(header) if header and header.isdigit() else None
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history,
+                            status=response.status, message=response.reason or "",
+                        )
+                    response.raise_for_status()
+                    body = await response.read()
+                    result = (response.status, body, response.headers)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                metric["requests"] += 1
+                metric["total_ms"] += elapsed_ms
+                metric["latencies"].append(elapsed_ms)
+                return result
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status in RETRY_STATUSES
+                if not retryable or attempt >= self.retries:
+                    metric["requests"] += 1
+                    metric["errors"] += 1
+                    logger.error(f"TMDB {endpoint} failed after {attempt + 1} attempt(s): {e!r}")
+                    raise
+                metric["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+                attempt += 1
+
+    def stats(self):
+        """Per-endpoint request count, errors, retries, avg/p95 latency in ms."""
+        stats = {}
+        for endpoint, metric in self.metrics.items():
+            latencies = sorted(metric["latencies"])
+            stats[endpoint] = {
+                "requests": metric["requests"],
+                "errors": metric["errors"],
+                "retries": metric["retries"],
+                "avg_ms": metric["total_ms"] / len(latencies) if latencies else 0.0,
+                "p95_ms": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            }
+        return stats
+
+
+tmdb_response_cache = TMDBResponseCache(tmdb_cache_col)
+tmdb_client = TMDBClient(TMDB_API_KEY, cache=tmdb_response_cache)
+
+def get_cast_and_crew(data):
+    """
+    Starring actors and director from the credits appended to a details response.
+    """
+    credits = data.get('credits') or {}
+    starring = [member['name'] for member in credits.get('cast', [])[:5]]
+    director = next((member['name'] for member in credits.get('crew', []) if member['job'] == 'Director'), 'N/A')
     return {"starring": starring, "director": director}
 
+# =========================
+# IMDb Details
+# =========================
+# IMDbPY scrapes synchronously, so lookups run on a small dedicated pool with a
+# hard timeout, each thread reusing one IMDb() instance. Results are kept in
+# imdb_cache_col per imdb_id (an LRU in front coalesces concurrent lookups), and
+# a circuit breaker skips IMDb entirely while it keeps failing; the caption then
+# falls back to the TMDB overview.
+
+IMDB_MEMORY_ENTRIES = 2000
+imdb_executor = ThreadPoolExecutor(max_workers=IMDB_WORKERS, thread_name_prefix="imdb")
+imdb_breaker = CircuitBreaker(IMDB_BREAKER_THRESHOLD, IMDB_BREAKER_COOLDOWN, name="imdb")
+imdb_details_cache = LRUCache(max_entries=IMDB_MEMORY_ENTRIES)
+imdb_stats = {"memory_hits": 0, "db_hits": 0, "lookups": 0, "timeouts": 0, "errors": 0, "skipped": 0}
+_imdb_local = threading.local()
+
 def get_imdb_details(imdb_id):
-    ia = imdb.IMDb()
+    """Scrape rating and plot (blocking). {} if IMDb has no such title; errors propagate."""
+    ia = getattr(_imdb_local, "ia", None)
+    if ia is None:
+        ia = _imdb_local.ia = imdb.IMDb()
+    movie = ia.get_movie(imdb_id.replace('tt', ''))
+    if not movie:
+        return {}
+    return {
+        "rating": movie.get('rating'),
+        "plot": movie.get('plot', [None])[0]
+    }
+
+async def fetch_imdb_details(imdb_id):
+    """
+    Rating and plot for an IMDb id, scraped at most once per title. Returns {}
+    when IMDb is unavailable (timeout, error, breaker open); those results
+    aren't cached, so the title is retried on a later post.
+    """
+    found = True
+
+    async def load():
+        nonlocal found
+        found = False
+        now = datetime.now(timezone.utc)
+        doc = await imdb_cache_col.find_one(
+            {"_id": imdb_id, "$or": [{"expires_at": None}, {"expires_at": {"$gt": now}}]}
+        )
+        if doc:
+            imdb_stats["db_hits"] += 1
+            return doc.get("details") or {}
+        if not imdb_breaker.allow():
+            imdb_stats["skipped"] += 1
+            raise RuntimeError("IMDb circuit open")
+        imdb_stats["lookups"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            details = await asyncio.wait_for(
+                loop.run_in_executor(imdb_executor, get_imdb_details, imdb_id), IMDB_TIMEOUT
+            )
+        except asyncio.CancelledError:
+            imdb_breaker.release()
+            raise
+        except asyncio.TimeoutError:
+            imdb_stats["timeouts"] += 1
+            imdb_breaker.record_failure()
+            raise
+        except Exception:
+            imdb_stats["errors"] += 1
+            imdb_breaker.record_failure()
+            raise
+        imdb_breaker.record_success()
+        update = {"details": details, "fetched_at": now}
+        if details:
+            await imdb_cache_col.update_one({"_id": imdb_id}, {"$set": update, "$unset": {"expires_at": ""}}, upsert=True)
+        else:
+            update["expires_at"] = update["fetched_at"] + timedelta(seconds=IMDB_MISS_TTL)
+            await imdb_cache_col.update_one({"_id": imdb_id}, {"$set": update}, upsert=True)
+        return details
+
     try:
-        movie = ia.get_movie(imdb_id.replace('tt', ''))
-        if not movie:
-            return {}
-        return {
-            "rating": movie.get('rating'),
-            "plot": movie.get('plot', [None])[0]
-        }
+        details = await imdb_details_cache.get_or_load(imdb_id, load)
+    except asyncio.TimeoutError:
+        logger.warning(f"IMDb lookup for {imdb_id} timed out after {IMDB_TIMEOUT}s")
+        return {}
     except Exception as e:
-        logger.error(f"IMDbPY error: {e}")
+        if imdb_breaker.state == "closed":
+            logger.error(f"IMDbPY error: {e}")
         return {}
+    if found:
+        imdb_stats["memory_hits"] += 1
+    return details
 
-def format_tmdb_info(tmdb_type, movie_id, data, season, episode):
-    cast_crew = get_cast_and_crew(tmdb_type, movie_id)
+def imdb_cache_stats():
+    hits = imdb_stats["memory_hits"] + imdb_stats["db_hits"]
+    total = hits + imdb_stats["lookups"]
+    return {**imdb_stats, "hit_rate": hits / total if total else 0.0, "breaker": imdb_breaker.state}
 
-    if tmdb_type == 'movie':
-        imdb_id = data.get('imdb_id')
-        imdb_info = get_imdb_details(imdb_id) if imdb_id else {}
+def get_imdb_id(data):
+    """IMDb id of a details response: top-level for movies, under external_ids for TV."""
+    return data.get('imdb_id') or (data.get('external_ids') or {}).get('imdb_id')
+
+def format_tmdb_info(tmdb_type, movie_id, data, season, episode, imdb_info=None):
+    """Caption for a title; data is a details response with credits appended. No I/O."""
+    cast_crew = get_cast_and_crew(data)
+    imdb_info = imdb_info or {}
 
+    if tmdb_type == 'movie':
         plot = imdb_info.get('plot')
         title = data.get('title')
         duration = format_duration(data.get('runtime'))
@@ -76,9 +444,6 @@ def format_tmdb_info(tmdb_type, movie_id, data, season, episode):
         return message.strip()
 
     elif tmdb_type == 'tv':
-        imdb_id = get_tv_imdb_id_sync(movie_id)
-        imdb_info = get_imdb_details(imdb_id) if imdb_id else {}
-
         plot = imdb_info.get('plot') if imdb_info.get('plot') else data.get('overview')
         title = data.get('name')
         language = ", ".join(lang.get('name', '') for lang in data.get('spoken_languages', [])) if data.get('spoken_languages') else ""
@@ -99,11 +464,9 @@ def format_tmdb_info(tmdb_type, movie_id, data, season, episode):
         else:
             release_date_fmt = release_date
 
-        message = (
-            f"<b>🎬Name:</b> {title}\n"
-            f"<b>📺Season:</b> S{season}\n" if season else ""
-            f"<b>📺Episode:</b> E{episode}\n" if episode else ""
-        )
+        message = f"<b>🎬Name:</b> {title}\n"
+        message += f"<b>📺Season:</b> S{season}\n" if season else ""
+        message += f"<b>📺Episode:</b> E{episode}\n" if episode else ""
         message += f"<b>⭐Rating:</b> {vote_average_str}/10\n" if vote_average_str is not None else ""
         message += f"<b>🅰️Language:</b> {language}\n" if language else ""
         message += f"<b>⚙️Genres:</b> {genre_tags}\n" if genre_tags else ""
@@ -117,43 +480,44 @@ def format_tmdb_info(tmdb_type, movie_id, data, season, episode):
     else:
         return "Unknown type. Unable to format information."
 
-def get_tv_imdb_id_sync(tv_id):
-    import requests
-    url = f"https://api.themoviedb.org/3/tv/{tv_id}/external_ids?api_key={TMDB_API_KEY}"
-    resp = requests.get(url)
-    data = resp.json()
-    return data.get("imdb_id")
+DETAILS_APPENDS = "credits,images,videos,external_ids"
 
 async def get_by_id(tmdb_type, tmdb_id, season=None, episode=None):
-    api_url = f"https://api.themoviedb.org/3/{tmdb_type}/{tmdb_id}?api_key={TMDB_API_KEY}&language=en-US"
-    image_url = f'https://api.themoviedb.org/3/{tmdb_type}/{tmdb_id}/images?api_key={TMDB_API_KEY}&language=en-US&include_image_language=en'
+    """
+    Caption, poster and trailer for a title. Details, credits, images, videos
+    and external ids arrive in one append_to_response request; the IMDb plot
+    comes from fetch_imdb_details().
+    """
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(api_url) as detail_response:
-                data = await detail_response.json()
-                async with session.get(image_url) as movie_response:
-                    images = await movie_response.json()
-                message = format_tmdb_info(tmdb_type, tmdb_id, data, season, episode)
-                poster_path = data.get('poster_path', None)
-                if 'backdrops' in images and images['backdrops']:
-                    poster_path = images['backdrops'][0]['file_path']
-                elif 'posters' in images and images['posters']:
-                    poster_path = images['posters'][0]['file_path']
-                poster_url = f"https://image.tmdb.org/t/p/original{poster_path}" if poster_path else None
-
-                video_url = f'https://api.themoviedb.org/3/{tmdb_type}/{tmdb_id}/videos?api_key={TMDB_API_KEY}'
-                async with session.get(video_url) as video_response:
-                    video_data = await video_response.json()
-                    trailer_url = None
-                    for video in video_data.get('results', []):
-                        if video['site'] == 'YouTube' and video['type'] == 'Trailer':
-                            trailer_url = f"https://www.youtube.com/watch?v={video['key']}"
-                            break
-
-                return {"message": message, "poster_url": poster_url, "trailer_url": trailer_url}
-    except aiohttp.ClientError as e:
-        print(f"Error fetching TMDB data: {e}")
-    return {"message": f"Error: {str(e)}", "poster_url": None}
+        data = await tmdb_client.get_json(
+            f"{tmdb_type}/{tmdb_id}",
+            language="en-US",
+            append_to_response=DETAILS_APPENDS,
+            include_image_language="en",
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Error fetching TMDB data: {e}")
+        return {"message": f"Error: {str(e)}", "poster_url": None}
+
+    imdb_id = get_imdb_id(data)
+    imdb_info = await fetch_imdb_details(imdb_id) if imdb_id else {}
+    message = format_tmdb_info(tmdb_type, tmdb_id, data, season, episode, imdb_info)
+
+    images = data.get('images') or {}
+    poster_path = data.get('poster_path', None)
+    if images.get('backdrops'):
+        poster_path = images['backdrops'][0]['file_path']
+    elif images.get('posters'):
+        poster_path = images['posters'][0]['file_path']
+    poster_url = f"https://image.tmdb.org/t/p/original{poster_path}" if poster_path else None
+
+    trailer_url = None
+    for video in (data.get('videos') or {}).get('results', []):
+        if video['site'] == 'YouTube' and video['type'] == 'Trailer':
+            trailer_url = f"https://www.youtube.com/watch?v={video['key']}"
+            break
+
+    return {"message": message, "poster_url": poster_url, "trailer_url": trailer_url}
 
 def truncate_overview(overview):
     """
@@ -171,54 +535,50 @@ def truncate_overview(overview):
     return overview
 
 async def get_movie_by_name(movie_name, release_year=None):
-    tmdb_search_url = f'https://api.themoviedb.org/3/search/movie?api_key={TMDB_API_KEY}&query={movie_name}'
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(tmdb_search_url) as search_response:
-                search_data = await search_response.json()
-                if search_data.get('results'):
-                    results = search_data['results']
-                    if release_year:
-                        # Filter by release year if provided
-                        results = [
-                            result for result in results
-                            if 'release_date' in result and result['release_date'] and result['release_date'][:4] == str(release_year)
-                        ]
-                    if results:
-                        result = results[0]
-                        return {
-                            "id": result['id'],
-                            "media_type": "movie"
-                        }
+        search_data = await tmdb_client.get_json("search/movie", query=movie_name)
+        if search_data.get('results'):
+            results = search_data['results']
+            if release_year:
+                # Filter by release year if provided
+                results = [
+                    result for result in results
+                    if 'release_date' in result and result['release_date'] and result['release_date'][:4] == str(release_year)
+                ]
+            if results:
+                result = results[0]
+                return {
+                    "id": result['id'],
+                    "media_type": "movie"
+                }
         return None
     except Exception as e:
+        # Raised rather than returned as None, so a failed lookup isn't cached as "no match"
         logger.error(f"Error fetching TMDb movie by name: {e}")
-        return
+        raise
 
 async def get_tv_by_name(tv_name, first_air_year=None):
-    tmdb_search_url = f'https://api.themoviedb.org/3/search/tv?api_key={TMDB_API_KEY}&query={tv_name}'
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(tmdb_search_url) as search_response:
-                search_data = await search_response.json()
-                if search_data.get('results'):
-                    results = search_data['results']
-                    if first_air_year:
-                        # Filter by first air year if provided
-                        results = [
-                            result for result in results
-                            if 'first_air_date' in result and result['first_air_date'] and result['first_air_date'][:4] == str(first_air_year)
-                        ]
-                    if results:
-                        result = results[0]
-                        return {
-                            "id": result['id'],
-                            "media_type": "tv"
-                        }
+        search_data = await tmdb_client.get_json("search/tv", query=tv_name)
+        if search_data.get('results'):
+            results = search_data['results']
+            if first_air_year:
+                # Filter by first air year if provided
+                results = [
+                    result for result in results
+                    if 'first_air_date' in result and result['first_air_date'] and result['first_air_date'][:4] == str(first_air_year)
+                ]
+            if results:
+                result = results[0]
+                return {
+                    "id": result['id'],
+                    "media_type": "tv"
+                }
         return None
     except Exception as e:
+        # Raised rather than returned as None, so a failed lookup isn't cached as "no match"
         logger.error(f"Error fetching TMDb TV by name: {e}")
-        return
+        raise
     
 GENRE_EMOJI_MAP = {
     "Action": "🥊", "Adventure": "🌋", "Animation": "🎬", "Comedy": "😂",
@@ -261,8 +621,5 @@ def format_duration(duration):
         return duration or ""
     
 async def get_tv_imdb_id(tv_id):
-    url = f"https://api.themoviedb.org/3/tv/{tv_id}/external_ids?api_key={TMDB_API_KEY}"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            data = await resp.json()
-            return data.get("imdb_id")
+    data = await tmdb_client.get_json(f"tv/{tv_id}/external_ids")
+    return data.get("imdb_id")
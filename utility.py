@@ -1,21 +1,22 @@
+import io
 import re
-import os
 import asyncio
+import functools
 import base64
 import uuid
 import time
 import requests
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from datetime import datetime, timezone, timedelta
+from collections import defaultdict
 from pyrogram.errors import FloodWait
 from pyrogram import enums
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config import logger
-from mutagen.mp3 import MP3
-from mutagen.flac import FLAC
-from mutagen.mp4 import MP4
-from mutagen.id3 import ID3, APIC
-from mutagen import File as MutagenFile
+from cover_art import detect_format, find_cover, image_extension
+from release_parser import parse_release, parse_releases
 
 from db import (
     allowed_channels_col,
@@ -24,10 +25,22 @@ from db import (
     auth_users_col,
     files_col,
     tmdb_col,
-    imgbb_col
+    imgbb_col,
+    files_writer,
+    tmdb_writer,
+    index_jobs_col,
+    tmdb_resolutions_col
 )
 from config import *
 from tmdb import get_movie_by_name, get_tv_by_name, get_by_id
+from search_engine import (
+    search_index, pack_keys, unpack_key, tokenize,
+    build_normalized_fields, normalize_file_names,
+    parse_facet_filters, size_band_range, FORMAT_ALIASES
+)
+from cache import LRUCache, BloomFilter
+from ratelimit import TokenBucket
+from ingest_queue import DurableQueue
 
 # =========================
 # Constants & Globals
@@ -35,65 +48,279 @@ from tmdb import get_movie_by_name, get_tv_by_name, get_by_id
 
 TOKEN_VALIDITY_SECONDS = 24 * 60 * 60  # 24 hours
 AUTO_DELETE_SECONDS = 5 * 60
+STREAM_CHUNK_SIZE = 1024 * 1024  # pyrogram stream_media chunk size
+AUDIO_COVER_MAX_BYTES = 16 * 1024 * 1024  # give up on tag headers larger than this
 
 
 # CACHE FOR SEARCH RESULTS
-search_cache = {}
+# Each entry is the full ranked hit list of a query as an array of packed
+# (channel_id, message_id) ints; every page and the total are sliced from it.
 SEARCH_CACHE_TTL = 300  # seconds (5 minutes)
+SEARCH_CACHE_MAX_ENTRIES = 2000
+SEARCH_CACHE_MAX_BYTES = 32 * 1024 * 1024
+search_cache = LRUCache(
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=SEARCH_CACHE_MAX_BYTES,
+    ttl=SEARCH_CACHE_TTL
+)
+
+def make_search_cache_key(query, channel_id=None):
+    # The registry version retires all-channel results when the channel set changes
+    return (query.lower(), channel_id, channel_registry.version)
+
+async def get_or_load_search(query, channel_id, loader):
+    """
+    Return the ranked hit list for a query from the cache, or from loader() on a miss.
+    Concurrent identical searches share a single loader call.
+    """
+    return await search_cache.get_or_load(make_search_cache_key(query, channel_id), loader)
+
+def invalidate_search_cache(channel_id=None):
+    """
+    Drop cached searches affected by a change in channel_id: its own entries
+    plus the all-channels (channel_id=None) entries. No channel clears everything.
+    """
+    if channel_id is None:
+        search_cache.clear()
+        facet_cache.clear()
+    else:
+        search_cache.invalidate(lambda key: key[1] is None or key[1] == channel_id)
+        facet_cache.invalidate(lambda key: key[1] is None or key[1] == channel_id)
+
+
+SEARCH_RESULT_LIMIT = 1000  # Max hits materialized per query on the Mongo fallback
+
+def facet_mongo_filter(filters):
+    """Translate parsed facet filters into a files_col query."""
+    mongo_filter = {}
+    if "year" in filters:
+        mongo_filter["year"] = filters["year"]
+    if "season" in filters:
+        mongo_filter["season"] = filters["season"]
+    if "format" in filters:
+        mime_types = [mime for mime, alias in FORMAT_ALIASES.items() if alias == filters["format"]]
+        mime_types.append(re.compile(f"/{re.escape(filters['format'])}$"))
+        mongo_filter["file_format"] = {"$in": mime_types}
+    if "size" in filters:
+        bounds = size_band_range(filters["size"])
+        if bounds:
+            lower, upper = bounds
+            mongo_filter["file_size"] = {"$gte": lower}
+            if upper is not None:
+                mongo_filter["file_size"]["$lt"] = upper
+    return mongo_filter
+
+async def search_result_ids(query, channel_id=None):
+    """
+    Run a search and return the full ranked hit list as packed (channel_id, message_id) ints.
+    Uses the in-memory index once it is built, Mongo before that.
+    Facet filters (year:2019 format:mkv ...) in the query narrow the hits.
+    """
+    search_filter = {}
+    if channel_id is not None:
+        search_filter["channel_id"] = channel_id
+    allowed_ids = channel_registry.ids()
+    if channel_id is None:
+        search_filter["channel_id"] = {"$in": allowed_ids}
+    if search_index.ready:
+        return await search_index.search_ids_async(query, [channel_id] if channel_id is not None else allowed_ids)
+    projection = {"_id": 0, "channel_id": 1, "message_id": 1}
+    query, filters = parse_facet_filters(query)
+    search_filter.update(facet_mongo_filter(filters))
+    tokens = tokenize(query)
+    if not tokens:
+        if not filters:
+            return pack_keys([])
+        cursor = files_col.find(search_filter, projection).sort("message_id", -1)
+        hits = await cursor.limit(SEARCH_RESULT_LIMIT).to_list()
+        return pack_keys((doc["channel_id"], doc["message_id"]) for doc in hits)
+    # Title words first: every token must match exactly except the last, which
+    # may be a prefix ("aveng"), as the user is typing it. Anchored regexes on
+    # title_tokens are range scans of the (title_tokens, channel_id) index.
+    title_filter = dict(search_filter)
+    title_filter["$and"] = [{"title_tokens": token} for token in tokens[:-1]]
+    title_filter["$and"].append({"title_tokens": {"$regex": f"^{re.escape(tokens[-1])}"}})
+    cursor = files_col.find(title_filter, projection).sort("message_id", -1)
+    hits = await cursor.limit(SEARCH_RESULT_LIMIT).to_list()
+    if not hits:
+        # Words outside the parsed title (quality, release group...) are in the text index
+        search_filter["$text"] = {"$search": query}
+        projection["score"] = {"$meta": "textScore"}
+        cursor = files_col.find(search_filter, projection).sort([("score", {"$meta": "textScore"})])
+        hits = await cursor.limit(SEARCH_RESULT_LIMIT).to_list()
+    return pack_keys((doc["channel_id"], doc["message_id"]) for doc in hits)
+
+def search_results_capped(result_ids):
+    """True if a hit list came from the Mongo fallback and stopped at SEARCH_RESULT_LIMIT."""
+    return not search_index.ready and len(result_ids) >= SEARCH_RESULT_LIMIT
+
+SEARCH_INDEX_RETRY_DELAY = 30  # seconds, doubled per failed build
+SEARCH_INDEX_MAX_RETRY_DELAY = 30 * 60
+
+async def load_search_index():
+    """
+    Build the in-memory search index, retrying with backoff until it succeeds
+    (searches use the capped Mongo fallback meanwhile). Once it is built, the
+    cached fallback results are dropped so searches get full, exact hit lists.
+    """
+    delay = SEARCH_INDEX_RETRY_DELAY
+    while not await search_index.load():
+        logger.warning(f"Search index build failed, retrying in {delay}s; searches use Mongo until then.")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, SEARCH_INDEX_MAX_RETRY_DELAY)
+    invalidate_search_cache()
+
+async def get_search_result_ids(query, channel_id=None):
+    # The full hit list is materialized once per query; pages and total are sliced from it
+    return await get_or_load_search(query, channel_id, lambda: search_result_ids(query, channel_id))
+
+# Facet counts per query, derived once from the cached hit list
+facet_cache = LRUCache(max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl=SEARCH_CACHE_TTL)
+
+async def get_search_facets(query, channel_id=None):
+    """
+    Facet counts ({facet: {value: count}}) for a query, or for whole channels
+    when the query is empty. Channel counts come straight from the index's
+    incrementally maintained tables; query counts from its cached hit list.
+    """
+    channel_ids = [channel_id] if channel_id is not None else channel_registry.ids()
+    if not query.strip():
+        return search_index.channel_facets(channel_ids)
+    key = make_search_cache_key(query, channel_id)
+    facets = facet_cache.get(key)
+    if facets is None:
+        facets = await search_index.count_facets_async(await get_search_result_ids(query, channel_id))
+        facet_cache.set(key, facets)
+    return facets
 
-def make_search_cache_key(query, page, channel_id=None):
-    return (query.lower(), page, channel_id)
-
-def get_cached_search(query, page, channel_id=None):
-    key = make_search_cache_key(query, page, channel_id)
-    entry = search_cache.get(key)
-    if entry and (time.time() - entry['time'] < SEARCH_CACHE_TTL):
-        return entry['files'], entry['total_files']
-    if entry:
-        del search_cache[key]
-    return None, None
-
-def set_cached_search(query, page, channel_id, files, total_files):
-    key = make_search_cache_key(query, page, channel_id)
-    search_cache[key] = {
-        'files': files,
-        'total_files': total_files,
-        'time': time.time()
-    }
 
-def invalidate_search_cache():
-    search_cache.clear()
+# CACHE FOR FILE DOCS
+# Page docs for hits the in-memory index can't serve (e.g. before it is built).
+FILE_DOC_CACHE_TTL = 600
+FILE_DOC_CACHE_MAX_ENTRIES = 5000
+file_doc_cache = LRUCache(max_entries=FILE_DOC_CACHE_MAX_ENTRIES, ttl=FILE_DOC_CACHE_TTL)
+FILE_DOC_PROJECTION = {"_id": 0, "file_name": 1, "file_size": 1, "file_format": 1, "message_id": 1, "date": 1, "channel_id": 1}
+
+async def fetch_file_docs(packed_keys):
+    """
+    Return file docs for packed (channel_id, message_id) keys, in the same order.
+    Served from the search index or doc cache; the rest come from a single $in query.
+    """
+    keys = [unpack_key(packed) for packed in packed_keys]
+    docs = {}
+    missing = defaultdict(list)
+    for channel_id, message_id in keys:
+        doc = search_index.get_doc(channel_id, message_id) or file_doc_cache.get((channel_id, message_id))
+        if doc is not None:
+            docs[(channel_id, message_id)] = doc
+        else:
+            missing[channel_id].append(message_id)
+    if missing:
+        query = {"$or": [
+            {"channel_id": channel_id, "message_id": {"$in": message_ids}}
+            for channel_id, message_ids in missing.items()
+        ]}
+        for doc in await files_col.find(query, FILE_DOC_PROJECTION).to_list():
+            key = (doc["channel_id"], doc["message_id"])
+            file_doc_cache.set(key, doc)
+            docs[key] = doc
+    return [docs[key] for key in keys if key in docs]
+
+
+# CACHE FOR PER-CHANNEL FILE COUNTS
+# Loaded lazily per channel, then kept exact by the insert/delete paths.
+channel_file_counts = {}
+
+async def get_channel_file_count(channel_id):
+    count = channel_file_counts.get(channel_id)
+    if count is None:
+        count = await files_col.count_documents({"channel_id": channel_id})
+        channel_file_counts[channel_id] = count
+    return count
+
+def adjust_channel_file_count(channel_id, delta):
+    if channel_id in channel_file_counts:
+        channel_file_counts[channel_id] = max(0, channel_file_counts[channel_id] + delta)
 
 
 # =========================
 # Channel & User Utilities
 # =========================
 
+class ChannelRegistry:
+    """
+    In-memory copy of allowed_channels_col, loaded once at startup and updated
+    in place by /addchannel and /removechannel.
+    - O(1) membership (channel_id in channel_registry) and id -> name lookup.
+    - version increases on every change; cache keys include it so results
+      computed for an older channel set are never served.
+    """
+
+    def __init__(self):
+        self.channels = {}  # channel_id -> channel_name
+        self.version = 0
+        self.loaded = False
+
+    async def load(self):
+        docs = await allowed_channels_col.find({}, {"_id": 0, "channel_id": 1, "channel_name": 1}).to_list()
+        self.channels = {doc["channel_id"]: doc.get("channel_name") for doc in docs}
+        self.version += 1
+        self.loaded = True
+
+    def __contains__(self, channel_id):
+        return channel_id in self.channels
+
+    def __len__(self):
+        return len(self.channels)
+
+    def name(self, channel_id, default=None):
+        return self.channels.get(channel_id) or default
+
+    def ids(self):
+        return list(self.channels)
+
+    def items(self):
+        """Channels as [{"channel_id", "channel_name"}], in the order they were added."""
+        return [
+            {"channel_id": channel_id, "channel_name": channel_name}
+            for channel_id, channel_name in self.channels.items()
+        ]
+
+    def add(self, channel_id, channel_name):
+        self.channels[channel_id] = channel_name
+        self.version += 1
+
+    def remove(self, channel_id):
+        if channel_id not in self.channels:
+            return False
+        del self.channels[channel_id]
+        self.version += 1
+        return True
+
+channel_registry = ChannelRegistry()
+
 async def get_allowed_channels():
-    return [
-        doc["channel_id"]
-        for doc in allowed_channels_col.find({}, {"_id": 0, "channel_id": 1})
-    ]
+    return channel_registry.ids()
 
-def add_user(user_id):
-    users_col.update_one(
+async def add_user(user_id):
+    await users_col.update_one(
         {"user_id": user_id},
         {"$set": {"user_id": user_id}},
         upsert=True
     )
 
-def authorize_user(user_id):
+async def authorize_user(user_id):
     """Authorize a user for 24 hours."""
     expiry = datetime.now(timezone.utc) + timedelta(seconds=TOKEN_VALIDITY_SECONDS)
-    auth_users_col.update_one(
+    await auth_users_col.update_one(
         {"user_id": user_id},
         {"$set": {"expiry": expiry}},
         upsert=True
     )
 
-def is_user_authorized(user_id):
+async def is_user_authorized(user_id):
     """Check if a user is authorized."""
-    doc = auth_users_col.find_one({"user_id": user_id})
+    doc = await auth_users_col.find_one({"user_id": user_id})
     if not doc:
         return False
     expiry = doc["expiry"]
@@ -112,11 +339,11 @@ def is_user_authorized(user_id):
 # Token Utilities
 # =========================
 
-def generate_token(user_id):
+async def generate_token(user_id):
     """Generate a new access token for a user."""
     token_id = str(uuid.uuid4())
     expiry = datetime.now(timezone.utc) + timedelta(seconds=TOKEN_VALIDITY_SECONDS)
-    tokens_col.insert_one({
+    await tokens_col.insert_one({
         "token_id": token_id,
         "user_id": user_id,
         "expiry": expiry,
@@ -124,16 +351,16 @@ def generate_token(user_id):
     })
     return token_id
 
-def is_token_valid(token_id, user_id):
+async def is_token_valid(token_id, user_id):
     """Check if a token is valid for a user."""
-    token = tokens_col.find_one({"token_id": token_id, "user_id": user_id})
+    token = await tokens_col.find_one({"token_id": token_id, "user_id": user_id})
     if not token:
         return False
     expiry = token["expiry"]
     if expiry.tzinfo is None:
         expiry = expiry.replace(tzinfo=timezone.utc)
     if expiry < datetime.now(timezone.utc):
-        tokens_col.delete_one({"_id": token["_id"]})
+        await tokens_col.delete_one({"_id": token["_id"]})
         return False
     return True
 
@@ -188,15 +415,18 @@ def shorten_url(long_url):
 # File Utilities
 # =========================
 
-def upsert_file_info(file_info):
-    """Insert or update file info, avoiding duplicates."""
-    files_col.update_one(
+def queue_file_upsert(file_info):
+    """
+    Insert or update file info on the files write-behind batcher without
+    waiting for it. Returns the op's future; see finish_file_write().
+    """
+    return files_writer.enqueue(UpdateOne(
         {"channel_id": file_info["channel_id"], "message_id": file_info["message_id"]},
         {"$set": file_info},
         upsert=True
-    )
+    ))
 
-def upsert_tmdb_info(tmdb_id, tmdb_type, season=None, episode=None):
+async def upsert_tmdb_info(tmdb_id, tmdb_type, season=None, episode=None):
     """
     Insert or update TMDB info in tmdb_col.
     If the same tmdb_id and tmdb_type exists, update season_info array.
@@ -211,11 +441,11 @@ def upsert_tmdb_info(tmdb_id, tmdb_type, season=None, episode=None):
     }
     if season_info:
         update["$addToSet"] = {"season_info": season_info}
-    tmdb_col.update_one(
+    await tmdb_writer.submit(UpdateOne(
         {"tmdb_id": tmdb_id, "tmdb_type": tmdb_type},
         update,
         upsert=True
-    )
+    ))
 
 async def restore_tmdb_photos(bot, start_id=None):
     """
@@ -225,8 +455,7 @@ async def restore_tmdb_photos(bot, start_id=None):
     query = {}
     if start_id:
         query['_id'] = {'$gt': start_id}
-    cursor = tmdb_col.find(query).sort('_id', 1)
-    docs = list(cursor)
+    docs = await tmdb_col.find(query).sort('_id', 1).to_list()
     for doc in docs:
         tmdb_id = doc.get("tmdb_id")
         tmdb_type = doc.get("tmdb_type")
@@ -270,8 +499,7 @@ async def restore_imgbb_photos(bot, start_id=None):
     query = {}
     if start_id:
         query['_id'] = {'$gt': start_id}
-    cursor = imgbb_col.find(query).sort('_id', 1)
-    docs = list(cursor)
+    docs = await imgbb_col.find(query).sort('_id', 1).to_list()
     for doc in docs:
         pic_url = doc.get("pic_url")
         caption = doc.get("caption")
@@ -353,6 +581,21 @@ async def safe_api_call(coro):
         except Exception:
             raise
 
+# Event loop lag: how late the loop wakes from a timed sleep. Anything
+# blocking the loop (sync I/O, heavy CPU) shows up here.
+LOOP_LAG_INTERVAL = 0.5  # seconds
+loop_lag = {"last_ms": 0.0, "avg_ms": 0.0, "max_ms": 0.0}
+
+async def monitor_loop_lag(interval=LOOP_LAG_INTERVAL):
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag_ms = max(0.0, (loop.time() - started - interval) * 1000)
+        loop_lag["last_ms"] = lag_ms
+        loop_lag["avg_ms"] = 0.9 * loop_lag["avg_ms"] + 0.1 * lag_ms
+        loop_lag["max_ms"] = max(loop_lag["max_ms"], lag_ms)
+
 async def delete_after_delay(client, chat_id, msg_id):
     await asyncio.sleep(AUTO_DELETE_SECONDS)
     try:
@@ -377,134 +620,449 @@ async def extract_tmdb_link(tmdb_url):
     return tmdb_type, tmdb_id
 
 async def extract_movie_info(caption):
+    """(title, year, season, episode) for a caption; see release_parser.parse_release()."""
     try:
-        # Extract season and episode (e.g., S01, S02, E01, E02)
-        season_match = re.search(r'\bS(\d{1,2})\b', caption, re.IGNORECASE)
-        episode_match = re.search(r'\bE(\d{1,2})\b', caption, re.IGNORECASE)
-
-        season = f"{int(season_match.group(1)):02d}" if season_match else None
-        episode = f"{int(episode_match.group(1)):02d}" if episode_match else None
-
-        current_year = datetime.now().year + 2  # Allow a couple of years ahead for upcoming movies
-        # Exclude 4-digit numbers followed by 'p' (like 1080p, 2160p, 720p)
-        years = [
-            y for y in re.findall(r'(\d{4})', caption)
-            if 1900 <= int(y) <= current_year and not re.search(rf'{y}p', caption, re.IGNORECASE)
-        ]
-        release_year = years[-1] if years else None
-
-        # Get everything before the last year
-        if release_year:
-            movie_name = caption.rsplit(release_year, 1)[0]
-            movie_name = movie_name.replace('.', ' ').replace('(', '').replace(')', '').strip()
-            movie_name = re.split(r'\s*A\s*K\s*A\s*', movie_name, flags=re.IGNORECASE)[0].strip()
-        else:
-            movie_name = caption
-
-        # Return all info separately
-        return movie_name, release_year, season, episode
+        info = parse_release(caption)
+        return info["title"], info["year"], info["season"], info["episode"]
     except Exception as e:
         logger.error(f"Extract Movie info Error : {e}")
     return None, None, None, None
 
+async def normalize_file_name(file_name):
+    title, year, season, episode = await extract_movie_info(file_name or "")
+    return build_normalized_fields(title, year, season, episode)
+
+NORMALIZE_BATCH_SIZE = 500
+NORMALIZE_BATCH_PAUSE = 0.5  # seconds between batches, so ingestion keeps the database
+
+async def backfill_normalized_fields(batch_size=NORMALIZE_BATCH_SIZE, pause=NORMALIZE_BATCH_PAUSE):
+    """
+    Migration: add title_norm/title_tokens/year/season/episode to files indexed
+    before those fields existed. Walks the files in _id order, so a batch that
+    fails to write is skipped (and retried on the next run) instead of being
+    selected again forever. Safe to re-run.
+    """
+    total = failed = 0
+    last_id = None
+    while True:
+        query = {"title_norm": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = await files_col.find(query, {"_id": 1, "file_name": 1}).sort("_id", 1).limit(batch_size).to_list()
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        fields = normalize_file_names([doc.get("file_name") for doc in docs])
+        ops = [UpdateOne({"_id": doc["_id"]}, {"$set": doc_fields}) for doc, doc_fields in zip(docs, fields)]
+        try:
+            await files_col.bulk_write(ops, ordered=False)
+            total += len(ops)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            failed += len(errors)
+            total += len(ops) - len(errors)
+            logger.warning(f"Backfill: {len(errors)} file(s) not updated, e.g. {errors[0].get('errmsg') if errors else e}")
+        await asyncio.sleep(pause)
+    if total or failed:
+        logger.info(f"Backfilled normalized fields for {total} files ({failed} failed).")
+    return total
+
         
+# =========================
+# Duplicate Detection
+# =========================
+
+# Membership filter over every (channel_id, file_name) in files_col. A miss
+# proves the file is new without a query; a hit is confirmed against the
+# unique (channel_id, file_name) index.
+FILE_NAME_FILTER_MIN_CAPACITY = 100_000
+FILE_NAME_FILTER_ERROR_RATE = 0.01
+file_name_filter = BloomFilter(FILE_NAME_FILTER_MIN_CAPACITY, FILE_NAME_FILTER_ERROR_RATE)
+file_name_filter_ready = False
+
+def file_name_key(channel_id, file_name):
+    return f"{channel_id}:{file_name}"
+
+async def warm_file_name_filter():
+    """Load every (channel_id, file_name) from a projection-only cursor into the filter."""
+    global file_name_filter, file_name_filter_ready
+    started = time.perf_counter()
+    total = await files_col.count_documents({})
+    # Leave room to grow; files added while warming go straight into this filter
+    file_name_filter = BloomFilter(
+        max(FILE_NAME_FILTER_MIN_CAPACITY, total * 2), FILE_NAME_FILTER_ERROR_RATE
+    )
+    cursor = files_col.find({}, {"_id": 0, "channel_id": 1, "file_name": 1}).batch_size(5000)
+    async for doc in cursor:
+        file_name_filter.add(file_name_key(doc.get("channel_id"), doc.get("file_name")))
+    file_name_filter_ready = True
+    logger.info(
+        f"Duplicate filter warmed with {len(file_name_filter)} file names "
+        f"in {time.perf_counter() - started:.1f}s."
+    )
+
+async def is_duplicate_file(channel_id, file_name, message_id=None):
+    """
+    True if another message in the channel already has this file name. The
+    document of message_id itself (a replayed queue item) isn't a duplicate.
+    """
+    if file_name_filter_ready and file_name_key(channel_id, file_name) not in file_name_filter:
+        return False
+    existing = await files_col.find_one(
+        {"channel_id": channel_id, "file_name": file_name},
+        {"_id": 1, "message_id": 1}
+    )
+    return existing is not None and existing.get("message_id") != message_id
+
+# =========================
+# TMDB Resolution Cache
+# =========================
+# (kind, normalized title, year) -> {"id", "media_type"} or None for "no match".
+# Persisted in tmdb_resolutions_col (TTL index on expires_at), with an LRU in
+# front that also coalesces the identical lookups of a season pack's episodes.
+
+TMDB_RESOLVE_MEMORY_TTL = 60 * 60  # seconds
+tmdb_resolve_cache = LRUCache(max_entries=5000, ttl=TMDB_RESOLVE_MEMORY_TTL)
+tmdb_resolve_stats = {"memory_hits": 0, "db_hits": 0, "negative_hits": 0, "lookups": 0}
+
+def tmdb_resolution_key(title, year, kind):
+    return f"{kind}:{' '.join(tokenize(title))}:{int(year) if year else ''}"
+
+async def resolve_tmdb_title(title, year=None, kind="movie"):
+    """
+    TMDB id for a parsed title, from cache when possible. Misses are cached
+    for TMDB_RESOLVE_MISS_TTL; lookup errors propagate and aren't cached.
+    """
+    key = tmdb_resolution_key(title, year, kind)
+    found = True
+
+    async def load():
+        nonlocal found
+        found = False
+        now = datetime.now(timezone.utc)
+        doc = await tmdb_resolutions_col.find_one({"_id": key, "expires_at": {"$gt": now}})
+        if doc:
+            tmdb_resolve_stats["db_hits"] += 1
+            result = doc.get("result")
+        else:
+            tmdb_resolve_stats["lookups"] += 1
+            async with tmdb_limiter:
+                if kind == "tv":
+                    result = await get_tv_by_name(title, year)
+                else:
+                    result = await get_movie_by_name(title, year)
+            ttl = TMDB_RESOLVE_TTL if result else TMDB_RESOLVE_MISS_TTL
+            await tmdb_resolutions_col.update_one(
+                {"_id": key},
+                {"$set": {
+                    "kind": kind,
+                    "title": title,
+                    "year": int(year) if year else None,
+                    "result": result,
+                    "expires_at": now + timedelta(seconds=ttl),
+                }},
+                upsert=True
+            )
+        if result is None:
+            tmdb_resolve_stats["negative_hits"] += doc is not None
+        return result
+
+    result = await tmdb_resolve_cache.get_or_load(key, load)
+    if found:
+        tmdb_resolve_stats["memory_hits"] += 1
+        tmdb_resolve_stats["negative_hits"] += result is None
+    return result
+
+def tmdb_resolve_hit_rate():
+    hits = tmdb_resolve_stats["memory_hits"] + tmdb_resolve_stats["db_hits"]
+    total = hits + tmdb_resolve_stats["lookups"]
+    return hits / total if total else 0.0
+
+async def purge_tmdb_resolutions(scope="all"):
+    """Drop cached resolutions: 'all', 'misses', or every entry for a title. Returns the count."""
+    if scope == "all":
+        query = {}
+    elif scope == "misses":
+        query = {"result": None}
+    else:
+        title_norm = " ".join(tokenize(scope))
+        query = {"_id": {"$regex": f"^(movie|tv):{re.escape(title_norm)}:"}}
+    result = await tmdb_resolutions_col.delete_many(query)
+    tmdb_resolve_cache.clear()
+    return result.deleted_count
+
 # =========================
 # Queue System for File Processing
 # =========================
 
 file_queue = asyncio.Queue()
+# Durable record of everything in file_queue; acked once a worker finishes a file
+ingest_queue = DurableQueue(INGEST_QUEUE_PATH, INGEST_MAX_ATTEMPTS)
+
+# Each external resource gets its own limiter, so throughput tracks the real
+# API limits instead of fixed sleeps.
+tmdb_limiter = TokenBucket(TMDB_RATE_LIMIT, name="tmdb")
+telegram_post_limiter = TokenBucket(TELEGRAM_POST_RATE_LIMIT, name="telegram_post")
+mongo_write_limiter = TokenBucket(MONGO_WRITE_RATE_LIMIT, name="mongo_write")
+
+# Shared by the worker pool: files being processed right now, (channel_id,
+# file_name) -> message_id (so two workers don't both pass the duplicate check
+# for the same name), TMDB posts in flight, and the running batch for the
+# "done" reply.
+ingest_inflight = {}
+tmdb_post_inflight = set()
+ingest_batch = {"count": 0, "active": 0, "reply_func": None}
+
+# Search cache invalidation is batched: channels touched by ingestion are
+# collected and invalidated once when the queue drains, or at least every
+# INVALIDATE_MAX_DELAY seconds while it stays busy.
+INVALIDATE_MAX_DELAY = 10  # seconds
+pending_invalidations = set()
+last_invalidation = {"at": 0.0}
+
+def flush_pending_invalidations():
+    channel_ids = list(pending_invalidations)
+    pending_invalidations.clear()
+    last_invalidation["at"] = time.monotonic()
+    for channel_id in channel_ids:
+        invalidate_search_cache(channel_id)
+    return len(channel_ids)
+
+def ingest_queue_stats():
+    return {
+        "queued": file_queue.qsize(),
+        "active": ingest_batch["active"],
+        "pending_invalidations": len(pending_invalidations),
+    }
+
+async def post_tmdb_update(bot, file_info, title, release_year, season, episode):
+    """Look the file up on TMDB and post it to the update channel once per title/season/episode."""
+    result = await resolve_tmdb_title(title, release_year, "tv" if season else "movie")
+    if not result:
+        raise ValueError(f"No TMDB match for {title} ({release_year or 'any year'})")
+
+    tmdb_id, tmdb_type = result['id'], result['media_type']
+    async with tmdb_limiter:
+        results = await get_by_id(tmdb_type, tmdb_id, season, episode)
+    poster_url = results.get('poster_url')
+    trailer = results.get('trailer_url')
+    info = results.get('message')
+
+    if not poster_url:
+        return
+    post_key = (tmdb_id, tmdb_type, season, episode)
+    if post_key in tmdb_post_inflight:
+        return  # Another worker is posting this title right now
+    tmdb_post_inflight.add(post_key)
+    try:
+        # Check if this tmdb_id, tmdb_type, season, episode already exists in tmdb_col
+        query = {"tmdb_id": tmdb_id, "tmdb_type": tmdb_type}
+        if season is not None:
+            query["season_info"] = {"$elemMatch": {"season": int(season)}}
+            if episode is not None:
+                query["season_info"]["$elemMatch"]["episode"] = int(episode)
+        elif episode is not None:
+            query["season_info"] = {"$elemMatch": {"episode": int(episode)}}
+
+        exists = await tmdb_col.find_one(query)
+        if not exists:
+            keyboard = InlineKeyboardMarkup(
+                [[InlineKeyboardButton("🎥 Trailer", url=trailer)]]) if trailer else None
+            async with telegram_post_limiter:
+                await safe_api_call(
+                    bot.send_photo(
+                        UPDATE_CHANNEL_ID,
+                        photo=poster_url,
+                        caption=info,
+                        parse_mode=enums.ParseMode.HTML,
+                        reply_markup=keyboard
+                    )
+                )
+        async with mongo_write_limiter:
+            await upsert_tmdb_info(tmdb_id, tmdb_type, season, episode)
+    finally:
+        tmdb_post_inflight.discard(post_key)
+
+async def report_duplicate_file(bot, file_info, reply_func):
+    telegram_link = generate_c_link(file_info["channel_id"], file_info["message_id"])
+    if reply_func:
+        await safe_api_call(
+            bot.send_message(
+                LOG_CHANNEL_ID,
+                f"⚠️ Duplicate File.\nLink: {telegram_link}",
+                parse_mode=enums.ParseMode.HTML
+            )
+        )
+
+async def process_queued_file(bot, file_info, reply_func, message):
+    """
+    Save one queued file, index it, and post its audio cover / TMDB card.
+    The files upsert is only queued: returns its future (None for a
+    duplicate), which finish_file_write() settles once the batch is written.
+    """
+    dedupe_key = (file_info["channel_id"], file_info["file_name"])
+    message_id = file_info["message_id"]
+    # Check for duplicate by file name in this channel. A replayed item whose
+    # upsert landed before a crash finds its own document; that is not a
+    # duplicate, and the steps after the upsert still need to run.
+    inflight_id = ingest_inflight.get(dedupe_key)
+    if (inflight_id is not None and inflight_id != message_id) or await is_duplicate_file(*dedupe_key, message_id):
+        await report_duplicate_file(bot, file_info, reply_func)
+        return None
+
+    # Held until the write lands (finish_file_write), not just while queueing it
+    ingest_inflight[dedupe_key] = message_id
+    try:
+        title, release_year, season, episode = await extract_movie_info(file_info["file_name"])
+        file_info.update(build_normalized_fields(title, release_year, season, episode))
+        async with mongo_write_limiter:
+            write = queue_file_upsert(file_info)
+        file_name_filter.add(file_name_key(*dedupe_key))
+        search_index.add(file_info)
+    except Exception:
+        ingest_inflight.pop(dedupe_key, None)
+        raise
+
+    if message is None and (file_info.get("file_format") or "").startswith("audio/"):
+        # Replayed after a restart: only audio needs the message itself
+        message = await safe_api_call(bot.get_messages(file_info["channel_id"], file_info["message_id"]))
+    if message is not None and message.audio:
+        try:
+            thumb = await extract_audio_cover(bot, message)
+        except Exception as e:
+            logger.error(f"Error extracting audio cover: {e}")
+            thumb = None
+        if thumb:
+            caption = f"🎧 <b>{message.audio.title}</b>\n🧑‍🎤 <b>{message.audio.artist}</b>"
+            async with telegram_post_limiter:
+                await bot.send_photo(UPDATE_CHANNEL3_ID, photo=thumb, caption=caption)
+    try:
+        if str(file_info["channel_id"]) not in EXCLUDE_CHANNEL_ID:
+            await post_tmdb_update(bot, file_info, title, release_year, season, episode)
+    except Exception as e:
+        logger.error(f"Error processing TMDB info:{e}")
+        if reply_func:
+            await safe_api_call(
+                bot.send_message(
+                    LOG_CHANNEL_ID,
+                    f'❌ Error processing TMDB info: {file_info["file_name"]}/n/n{e}',
+                    parse_mode=enums.ParseMode.HTML
+                )
+            )
+    return write
+
+def make_reply_func(bot, reply):
+    """
+    Status messages for a queued file go to a reply target that can be stored:
+    ("reply", chat_id, message_id) replies to a message, ("edit", chat_id,
+    message_id) edits one (the /index progress message).
+    """
+    if not reply:
+        return None
+    kind, chat_id, message_id = reply
+    if kind == "edit":
+        return functools.partial(bot.edit_message_text, chat_id, message_id)
+    return functools.partial(bot.send_message, chat_id, reply_to_message_id=message_id)
+
+# Failed files still pending in the durable queue wait here for their retry;
+# put() ignores them meanwhile, so they are only re-queued by requeue_after()
+retry_tasks = set()
+
+async def requeue_after(delay, item):
+    try:
+        await asyncio.sleep(delay)
+        await file_queue.put(item)
+    finally:
+        retry_tasks.discard(asyncio.current_task())
+
+async def fail_queued_file(bot, item, error, reply_func):
+    """Record a failed attempt; re-queue the file with backoff while it has attempts left."""
+    file_info = item[0]
+    key = (file_info["channel_id"], file_info["message_id"])
+    logger.error(f"Error saving file {key}: {error}")
+    try:
+        attempts = await ingest_queue.fail(*key, error)
+    except Exception:
+        attempts = None
+    if attempts:
+        retry_tasks.add(asyncio.create_task(
+            requeue_after(INGEST_RETRY_DELAY * 2 ** (attempts - 1), item)
+        ))
+    if reply_func:
+        await safe_api_call(reply_func(f"❌ Error saving file: {error}"))
+
+# Files whose upsert is queued on files_writer; the worker that produced one
+# has already moved on, so batches fill from many files at once
+file_write_tasks = set()
+
+async def finish_file_write(bot, item, write, reply_func):
+    """Wait for a file's queued upsert, then ack it, or handle a duplicate / failure."""
+    file_info = item[0]
+    key = (file_info["channel_id"], file_info["message_id"])
+    dedupe_key = (file_info["channel_id"], file_info["file_name"])
+    try:
+        result = await write
+    except BulkWriteError as e:
+        if any(error.get("code") == 11000 for error in e.details.get("writeErrors", [])):
+            # The unique (channel_id, file_name) index caught a duplicate the checks missed
+            search_index.remove(*key)
+            await report_duplicate_file(bot, file_info, reply_func)
+            await ingest_queue.ack(*key)
+        else:
+            await fail_queued_file(bot, item, e, reply_func)
+        return
+    except Exception as e:
+        await fail_queued_file(bot, item, e, reply_func)
+        return
+    finally:
+        if ingest_inflight.get(dedupe_key) == key[1]:
+            del ingest_inflight[dedupe_key]
+        file_write_tasks.discard(asyncio.current_task())
+    if result.upserted_id is not None:
+        adjust_channel_file_count(file_info["channel_id"], 1)
+    await ingest_queue.ack(*key)
+
+async def flush_file_writes():
+    """Write every queued file upsert now and wait for its ack / failure handling."""
+    await files_writer.flush()
+    if file_write_tasks:
+        await asyncio.gather(*file_write_tasks, return_exceptions=True)
 
 async def file_queue_worker(bot):
-    processing_count = 0
-    last_reply_func = None
+    """One member of the ingestion pool; any number of these drain file_queue concurrently."""
     while True:
-        item = await file_queue.get()
-        file_info, reply_func, message = item
-        processing_count += 1
+        file_info, reply, message = await file_queue.get()
+        key = (file_info["channel_id"], file_info["message_id"])
+        reply_func = make_reply_func(bot, reply)
+        ingest_batch["count"] += 1
+        ingest_batch["active"] += 1
         if reply_func:
-            last_reply_func = reply_func
+            ingest_batch["reply_func"] = reply_func
         try:
-            # Check for duplicate by file name in this channel
-            existing = files_col.find_one({
-                "channel_id": file_info["channel_id"],
-                "file_name": file_info["file_name"]
-            })
-            if existing:
-                telegram_link = generate_c_link(file_info["channel_id"], file_info["message_id"])
-                if reply_func:
-                    await safe_api_call(
-                        bot.send_message(
-                            LOG_CHANNEL_ID,
-                            f"⚠️ Duplicate File.\nLink: {telegram_link}",
-                            parse_mode=enums.ParseMode.HTML
-                        )
-                    )
+            await ingest_queue.lease(*key)
+            write = await process_queued_file(bot, file_info, reply_func, message)
+            if write is None:
+                await ingest_queue.ack(*key)
             else:
-                upsert_file_info(file_info)
-                if message.audio:
-                    audio_path = await bot.download_media(message)
-                    thumb_path = await get_audio_thumbnail(audio_path)
-                    file_info = f"🎧 <b>{message.audio.title}</b>\n🧑‍🎤 <b>{message.audio.artist}</b>"
-                    await bot.send_photo(UPDATE_CHANNEL3_ID, photo=thumb_path, caption=file_info)
-                    os.remove(audio_path)
-                    os.remove(thumb_path)
-                try:
-                    if str(file_info["channel_id"]) not in EXCLUDE_CHANNEL_ID:
-                        title, release_year, season, episode = await extract_movie_info(file_info["file_name"])
-                        if season:
-                            result = await get_tv_by_name(title, release_year)
-                        else:
-                            result = await get_movie_by_name(title, release_year)
-
-                        tmdb_id, tmdb_type = result['id'], result['media_type'] 
-                        results = await get_by_id(tmdb_type, tmdb_id, season, episode)
-                        poster_url = results.get('poster_url')
-                        trailer = results.get('trailer_url')
-                        info = results.get('message')
-
-                        
-                        if poster_url:
-                            # Check if this tmdb_id, tmdb_type, season, episode already exists in tmdb_col
-                            query = {"tmdb_id": tmdb_id, "tmdb_type": tmdb_type}
-                            if season is not None:
-                                query["season_info"] = {"$elemMatch": {"season": int(season)}}
-                                if episode is not None:
-                                    query["season_info"]["$elemMatch"]["episode"] = int(episode)
-                            elif episode is not None:
-                                query["season_info"] = {"$elemMatch": {"episode": int(episode)}}
-
-                            exists = tmdb_col.find_one(query)
-                            if not exists:
-                                keyboard = InlineKeyboardMarkup(
-                                    [[InlineKeyboardButton("🎥 Trailer", url=trailer)]]) if trailer else None
-                                await asyncio.sleep(3)  # Avoid hitting API limits
-                                await safe_api_call(
-                                    bot.send_photo(
-                                        UPDATE_CHANNEL_ID,
-                                        photo=poster_url,
-                                        caption=info,
-                                        parse_mode=enums.ParseMode.HTML,
-                                        reply_markup=keyboard
-                                    )
-                                )
-                            upsert_tmdb_info(tmdb_id, tmdb_type, season, episode)
-
-                except Exception as e:
-                    logger.error(f"Error processing TMDB info:{e}")
-                    if reply_func:
-                        await safe_api_call(
-                            bot.send_message(
-                                LOG_CHANNEL_ID,
-                                f'❌ Error processing TMDB info: {file_info["file_name"]}/n/n{e}',
-                                parse_mode=enums.ParseMode.HTML
-                            )
-                        )
+                file_write_tasks.add(asyncio.create_task(
+                    finish_file_write(bot, (file_info, reply, message), write, reply_func)
+                ))
         except Exception as e:
-            if reply_func:
-                await safe_api_call(reply_func(f"❌ Error saving file: {e}"))
+            await fail_queued_file(bot, (file_info, reply, message), e, reply_func)
         finally:
+            pending_invalidations.add(file_info["channel_id"])
+            ingest_batch["active"] -= 1
             file_queue.task_done()
-            if file_queue.empty():
+            drained = file_queue.empty() and ingest_batch["active"] == 0
+            if drained:
+                # Land the batch's last writes before invalidating and reporting it done
+                await flush_file_writes()
+            if drained or time.monotonic() - last_invalidation["at"] >= INVALIDATE_MAX_DELAY:
+                flush_pending_invalidations()
+            if drained:
+                processing_count, last_reply_func = ingest_batch["count"], ingest_batch["reply_func"]
+                ingest_batch["count"] = 0  # Reset for next batch
+                ingest_batch["reply_func"] = None
                 if processing_count > 1 and last_reply_func:
                     try:
                         await safe_api_call(
@@ -514,38 +1072,279 @@ async def file_queue_worker(bot):
                         )
                     except Exception:
                         pass
-                processing_count = 0  # Reset for next batch
-                last_reply_func = None  # Reset for next batch
 
-            
+def start_file_queue_workers(bot, workers=INGEST_WORKERS):
+    """Start the ingestion worker pool on the bot's loop."""
+    return [bot.loop.create_task(file_queue_worker(bot)) for _ in range(max(1, workers))]
+
+# =========================
+# Channel Message Fetching
+# =========================
+
+async def iter_message_batches(client, channel_id, start_msg_id, end_msg_id,
+                               batch_size=INDEX_BATCH_SIZE, prefetch=INDEX_PREFETCH):
+    """
+    Yield (batch_start, batch_end, messages) for a message id range, one
+    multi-id get_messages call per batch. Up to `prefetch` batches are
+    requested ahead, so fetching overlaps with the caller queueing the
+    current one. A failed batch yields its exception in place of messages.
+    """
+    async def fetch(batch_start, batch_end):
+        try:
+            messages = await safe_api_call(
+                client.get_messages(channel_id, list(range(batch_start, batch_end + 1)))
+            )
+        except Exception as e:
+            return e
+        if not isinstance(messages, list):
+            messages = [messages]
+        return messages
+
+    ranges = (
+        (batch_start, min(batch_start + batch_size - 1, end_msg_id))
+        for batch_start in range(start_msg_id, end_msg_id + 1, batch_size)
+    )
+    pending = []
+    try:
+        for batch_range in ranges:
+            pending.append((batch_range, asyncio.ensure_future(fetch(*batch_range))))
+            if len(pending) <= prefetch:
+                continue
+            (batch_start, batch_end), task = pending.pop(0)
+            yield batch_start, batch_end, await task
+        while pending:
+            (batch_start, batch_end), task = pending.pop(0)
+            yield batch_start, batch_end, await task
+    finally:
+        for _, task in pending:
+            task.cancel()
 
 # =========================
 # Unified File Queueing
 # =========================
 
-async def queue_file_for_processing(message, channel_id=None, reply_func=None):
-    try:            
+async def queue_file_for_processing(message, channel_id=None, reply=None):
+    """
+    Record the file in the durable ingest queue, then hand it to the workers.
+    A message that is already queued (e.g. re-indexed mid-run) is skipped.
+    reply is the storable status target, see make_reply_func().
+    """
+    try:
         file_info = extract_file_info(message, channel_id=channel_id)
         if file_info["file_name"]:
-            await file_queue.put((file_info, reply_func, message))
+            payload = {"file_info": file_info, "reply": reply}
+            if await ingest_queue.put(file_info["channel_id"], file_info["message_id"], payload):
+                await file_queue.put((file_info, reply, message))
     except Exception as e:
-        if reply_func:
-            await safe_api_call(reply_func(f"❌ Error queuing file: {e}"))
+        if reply:
+            await safe_api_call(make_reply_func(message._client, reply)(f"❌ Error queuing file: {e}"))
+
+async def replay_ingest_queue():
+    """
+    Startup: re-queue everything recorded but not acknowledged before the last
+    shutdown or crash. Messages are re-fetched by the worker only if needed.
+    """
+    payloads = await ingest_queue.recover()
+    for payload in payloads:
+        await file_queue.put((payload["file_info"], payload.get("reply"), None))
+    if payloads:
+        logger.info(f"Replaying {len(payloads)} file(s) from the ingest queue.")
+    return len(payloads)
+
+# =========================
+# Indexing Jobs
+# =========================
+# A /index run is a job document in index_jobs_col:
+#   channel_id, start_msg_id, end_msg_id, checkpoint (last message id fully
+#   queued), status (running/paused/cancelled/done/failed), scanned, queued,
+#   elapsed (seconds spent running, across restarts), chat_id/reply_id of the
+#   progress message.
+# Jobs left "running" are picked up again by resume_index_jobs() on startup.
+
+INDEX_PROGRESS_INTERVAL = 5  # seconds between progress edits / checkpoints
+index_job_tasks = {}  # job _id -> running asyncio.Task
+index_job_stop_status = {}  # job _id -> status to record when its task is cancelled
+
+def index_job_eta(job, rate):
+    remaining = job["end_msg_id"] - job["checkpoint"]
+    if rate <= 0 or remaining <= 0:
+        return None
+    return remaining / rate
 
-def delete_expired_auth_users():
+def format_index_job(job):
+    total = job["end_msg_id"] - job["start_msg_id"] + 1
+    done = job["checkpoint"] - job["start_msg_id"] + 1
+    rate = job["scanned"] / job["elapsed"] if job.get("elapsed") else 0.0
+    eta = index_job_eta(job, rate) if job["status"] == "running" else None
+    text = (
+        f"<code>{job['_id']}</code> [{job['status']}] channel {job['channel_id']}\n"
+        f"{job['start_msg_id']}→{job['end_msg_id']}: {max(0, done)}/{total} scanned, "
+        f"{job['queued']} queued, {rate:.0f} msgs/sec"
+    )
+    if eta is not None:
+        text += f", ETA {timedelta(seconds=int(eta))}"
+    if job.get("error"):
+        text += f"\n⚠️ {job['error']}"
+    return text
+
+async def create_index_job(channel_id, start_msg_id, end_msg_id, chat_id, reply_id):
+    now = datetime.now(timezone.utc)
+    job = {
+        "channel_id": channel_id,
+        "start_msg_id": start_msg_id,
+        "end_msg_id": end_msg_id,
+        "checkpoint": start_msg_id - 1,
+        "status": "running",
+        "scanned": 0,
+        "queued": 0,
+        "elapsed": 0.0,
+        "chat_id": chat_id,
+        "reply_id": reply_id,
+        "created_at": now,
+        "updated_at": now,
+    }
+    result = await index_jobs_col.insert_one(job)
+    job["_id"] = result.inserted_id
+    return job
+
+async def run_index_job(bot, job):
+    """
+    Scan a job's remaining range, queue every file in it, and checkpoint the
+    last fully queued message id every few seconds. Cancelling the task
+    saves the checkpoint; the recorded status comes from index_job_stop_status
+    (paused/cancelled), or stays "running" so the job resumes after a restart.
+    """
+    job_id = job["_id"]
+    channel_id = job["channel_id"]
+    reply = ("edit", job["chat_id"], job["reply_id"])
+    reply_func = make_reply_func(bot, reply)
+    started = time.monotonic()
+    base_elapsed = job.get("elapsed", 0.0)
+    last_progress = started
+
+    async def save(**fields):
+        job.update(fields)
+        job["elapsed"] = base_elapsed + time.monotonic() - started
+        job["updated_at"] = datetime.now(timezone.utc)
+        await index_jobs_col.update_one(
+            {"_id": job_id},
+            {"$set": {key: value for key, value in job.items() if key != "_id"}}
+        )
+
+    try:
+        async for batch_start, batch_end, messages in iter_message_batches(
+            bot, channel_id, job["checkpoint"] + 1, job["end_msg_id"]
+        ):
+            if isinstance(messages, Exception):
+                await safe_api_call(bot.send_message(
+                    job["chat_id"], f"Failed to get messages {batch_start}-{batch_end}: {messages}"
+                ))
+            else:
+                for msg in messages:
+                    if not msg or msg.empty:
+                        continue
+                    if msg.document or msg.video or msg.audio or msg.photo:
+                        await queue_file_for_processing(msg, channel_id=channel_id, reply=reply)
+                        job["queued"] += 1
+            job["scanned"] += batch_end - batch_start + 1
+            job["checkpoint"] = batch_end
+
+            now = time.monotonic()
+            if now - last_progress >= INDEX_PROGRESS_INTERVAL:
+                last_progress = now
+                await save()
+                try:
+                    await safe_api_call(reply_func(f"Indexing...\n{format_index_job(job)}", parse_mode=enums.ParseMode.HTML))
+                except Exception:
+                    pass
+        await save(status="done")
+        logger.info(f"✅ Index job {job_id}: queued {job['queued']} files from channel {channel_id} for processing.")
+    except asyncio.CancelledError:
+        await save(status=index_job_stop_status.pop(job_id, "running"))
+        raise
+    except Exception as e:
+        logger.error(f"Index job {job_id} failed: {e}")
+        await save(status="failed", error=str(e))
+    finally:
+        index_job_tasks.pop(job_id, None)
+        index_job_stop_status.pop(job_id, None)
+    try:
+        await safe_api_call(reply_func(f"Indexing finished.\n{format_index_job(job)}", parse_mode=enums.ParseMode.HTML))
+    except Exception:
+        pass
+
+def start_index_job(bot, job):
+    task = bot.loop.create_task(run_index_job(bot, job))
+    index_job_tasks[job["_id"]] = task
+    return task
+
+async def get_index_job(job_id):
+    try:
+        return await index_jobs_col.find_one({"_id": ObjectId(job_id)})
+    except Exception:
+        return None
+
+async def stop_index_job(job_id, status):
+    """Pause or cancel a job. Returns the updated job, or None if it doesn't exist."""
+    job = await get_index_job(job_id)
+    if not job or job["status"] in ("done", "cancelled"):
+        return job
+    task = index_job_tasks.get(job["_id"])
+    if task:
+        index_job_stop_status[job["_id"]] = status
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    else:
+        await index_jobs_col.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": status, "updated_at": datetime.now(timezone.utc)}}
+        )
+    return await get_index_job(job_id)
+
+async def resume_index_job(bot, job_id):
+    """Restart a paused or failed job from its checkpoint."""
+    job = await get_index_job(job_id)
+    if not job or job["status"] in ("done", "cancelled") or job["_id"] in index_job_tasks:
+        return job
+    job["status"] = "running"
+    job.pop("error", None)
+    await index_jobs_col.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": "running"}, "$unset": {"error": ""}}
+    )
+    start_index_job(bot, job)
+    return job
+
+async def resume_index_jobs(bot):
+    """Startup: restart every job that was running when the bot went down."""
+    jobs = await index_jobs_col.find({"status": "running"}).sort("created_at", 1).to_list()
+    for job in jobs:
+        start_index_job(bot, job)
+    if jobs:
+        logger.info(f"Resumed {len(jobs)} index job(s).")
+    return len(jobs)
+
+async def checkpoint_index_jobs():
+    """Before a restart: stop running jobs, saving their checkpoints with status left as running."""
+    tasks = list(index_job_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def delete_expired_auth_users():
     """
     Delete expired auth users from auth_users_col using 'expiry' field.
     """
     now = datetime.now(timezone.utc)
-    result = auth_users_col.delete_many({"expiry": {"$lt": now}})
+    result = await auth_users_col.delete_many({"expiry": {"$lt": now}})
     logger.info(f"Deleted {result.deleted_count} expired auth users.")
 
-def delete_expired_tokens():
+async def delete_expired_tokens():
     """
     Delete expired tokens from tokens_col using 'expiry' field.
     """
     now = datetime.now(timezone.utc)
-    result = tokens_col.delete_many({"expiry": {"$lt": now}})
+    result = await tokens_col.delete_many({"expiry": {"$lt": now}})
     logger.info(f"Deleted {result.deleted_count} expired tokens.")
 
 async def periodic_expiry_cleanup(interval_seconds=3600 * 4):
@@ -553,32 +1352,40 @@ async def periodic_expiry_cleanup(interval_seconds=3600 * 4):
     Periodically delete expired auth users and tokens.
     """
     while True:
-        delete_expired_auth_users()
-        delete_expired_tokens()
+        await delete_expired_auth_users()
+        await delete_expired_tokens()
         await asyncio.sleep(interval_seconds)
 
 
-async def get_audio_thumbnail(audio_path, output_dir="downloads"):
-    audio = MutagenFile(audio_path)
-    thumbnail_path = os.path.join(output_dir, "audio_thumbnail.jpg")
-
-    if isinstance(audio, MP3):
-        if audio.tags and isinstance(audio.tags, ID3):
-            for tag in audio.tags.values():
-                if isinstance(tag, APIC):
-                    with open(thumbnail_path, "wb") as img_file:
-                        img_file.write(tag.data)
-                    return thumbnail_path
-    elif isinstance(audio, FLAC):
-        if audio.pictures:
-            with open(thumbnail_path, "wb") as img_file:
-                img_file.write(audio.pictures[0].data)
-            return thumbnail_path
-    elif isinstance(audio, MP4):
-        if audio.tags and 'covr' in audio.tags:
-            cover = audio.tags['covr'][0]
-            with open(thumbnail_path, "wb") as img_file:
-                img_file.write(cover)
-            return thumbnail_path
-    
-    return None
+async def extract_audio_cover(bot, message, max_bytes=AUDIO_COVER_MAX_BYTES):
+    """
+    Stream only the tag header of an audio message and return its embedded
+    cover as an in-memory file (named for send_photo), or None.
+    Reads whole stream_media chunks, skipping any chunks between the start of
+    the file and an MP4 moov atom stored after the audio.
+    """
+    data, offset, fetched = bytearray(), 0, 0
+    fmt, need = None, (0, 12)
+    while need:
+        start, end = need
+        if start < offset or start > offset + len(data):
+            # Needed range isn't contiguous with the buffer: restart at its chunk
+            offset, data = start - start % STREAM_CHUNK_SIZE, bytearray()
+        if end > offset + len(data):
+            first_chunk = (offset + len(data)) // STREAM_CHUNK_SIZE
+            chunks = -(-(end - offset - len(data)) // STREAM_CHUNK_SIZE)
+            if fetched + chunks * STREAM_CHUNK_SIZE > max_bytes:
+                return None
+            async for chunk in bot.stream_media(message, offset=first_chunk, limit=chunks):
+                data += chunk
+                fetched += len(chunk)
+            if end > offset + len(data):
+                return None  # File ended first
+        if fmt is None:
+            fmt = detect_format(data[:12])
+        cover, need = find_cover(fmt, data, offset, start)
+    if not cover:
+        return None
+    thumb = io.BytesIO(cover)
+    thumb.name = f"cover_{message.chat.id}_{message.id}.{image_extension(cover)}"
+    return thumb